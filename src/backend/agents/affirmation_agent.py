@@ -1,22 +1,59 @@
+import json
+import logging
+import re
+
+from metrics import AGENT_CALL_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+
 class AffirmationAgent:
-    def __init__(self, model):
-        self.model = model
+    FALLBACK_AFFIRMATION = "You are capable of amazing things. Trust in your journey."
+
+    def __init__(self, llm):
+        self.llm = llm
         # self.user_info = ""
         # self.user_mood = ""
         # self.latest_journals = ""
 
-    def generate_motivational_affirmations(
+    def build_prompt(self, user_info, user_mood, latest_journals) -> str:
+        return f"""Generate a single motivational affirmation or quote based on the user's context:
+        User Info: {user_info}
+        Current Mood: {user_mood}
+        Recent Journal Entries: {latest_journals}
+        Create an uplifting, personalized affirmation that resonates with their current state. If mood and journals are empty, focus on the user info. Keep it concise and inspiring."""
+
+    @timed(AGENT_CALL_SECONDS)
+    async def generate_motivational_affirmations(
         self, user_info, user_mood, latest_journals
     ) -> str:
-        prompt = f"""Generate a single motivational affirmation or quote based on the user's context:
+        prompt = self.build_prompt(user_info, user_mood, latest_journals)
+
+        try:
+            response = await self.llm.generate(prompt, namespace="affirmation")
+            return response.strip()
+        except Exception as e:
+            logger.warning("❌ Failed to generate affirmation: %s", e)
+            return self.FALLBACK_AFFIRMATION
+
+    @timed(AGENT_CALL_SECONDS)
+    async def generate_affirmation_batch(
+        self, user_info, user_mood, latest_journals, count: int
+    ) -> list[str]:
+        """Generate `count` distinct affirmations in a single call."""
+        prompt = f"""Generate a JSON array of {count} distinct motivational affirmations or quotes based on the user's context:
         User Info: {user_info}
         Current Mood: {user_mood}
         Recent Journal Entries: {latest_journals}
-        Create an uplifting, personalized affirmation that resonates with their current state. If mood and journals are empty, focus on the user info. Keep it concise and inspiring."""
+        Each affirmation should be uplifting, concise and resonate with their current state. Return ONLY a valid JSON array of strings."""
+
+        response = await self.llm.generate(prompt)
 
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            match = re.search(r"\[.*\]", response, re.DOTALL)
+            parsed = json.loads(match.group()) if match else []
         except Exception as e:
-            print(f"❌ Failed to generate affirmation: {e}")
-            return "You are capable of amazing things. Trust in your journey."
+            logger.warning("❌ Failed to parse affirmation batch: %s", e)
+            return []
+
+        return [str(a).strip() for a in parsed if isinstance(a, str) and a.strip()]
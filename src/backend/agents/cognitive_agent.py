@@ -1,27 +1,114 @@
-import json, re, uuid
+import asyncio, hashlib, json, logging, re, uuid
+from typing import List, Optional
+from metrics import AGENT_CALL_SECONDS, timed
 from models.classes import CognitiveSupportResponse
+from streaming_json import IncrementalJSONParser
+from context_loader import CONTEXT_DEADLINE_SECONDS, UserContext
+
+logger = logging.getLogger(__name__)
 
 class CognitiveAgent:
-    def __init__(self, model, db_accessor):
-        self.model = model
-        self.db_accessor = db_accessor
+    CONTEXT_SOURCES = ("moods", "journals", "insights")
+    # Static CBT guidance served when Gemini is unavailable
+    FALLBACK_RESPONSE = CognitiveSupportResponse(
+        coping_mechanism=(
+            "Try box breathing: breathe in for 4 seconds, hold for 4, out for 4, hold for 4, "
+            "and repeat for a few minutes. Then write down the thought that is bothering you "
+            "and one piece of evidence for and against it."
+        ),
+        cognitive_distortion="",
+        stress_patterns=[],
+        summary="We couldn't analyze your recent entries right now. Please try again in a little while.",
+    )
 
+    def __init__(self, llm, context_loader, retriever=None):
+        self.llm = llm
+        self.context_loader = context_loader
+        self.retriever = retriever
+
+    @timed(AGENT_CALL_SECONDS)
     async def get_cognitive_support(self, user_id: str) -> CognitiveSupportResponse:
 
-        print("HI WE MADE IT TWICEEEE")
-        print(user_id)
+        context = await self.context_loader.load(user_id, self.CONTEXT_SOURCES)
+
+        logger.debug("Context for %s: %d moods, %d journals, missing=%s", user_id, len(context.moods), len(context.journals), context.missing)
+
+        prompt = self.build_prompt(context, await self.retrieve_passages(user_id, context))
+
+        response = await self.llm.generate(prompt, **self.cache_args(user_id, context))
+
+        logger.debug("Raw cognitive support response: %s", response)
+
+        try:
+            match = re.search(r"\{.*\}", response, re.DOTALL)
+            parsed = json.loads(match.group()) if match else {}
+        except Exception:
+            parsed = {}
+        if not parsed:
+            raise ValueError("Unparseable cognitive support response")
+
+        return self.to_response(parsed)
+
+    async def stream_cognitive_support(self, user_id: str):
+        """Yield parser events as the model streams its answer, then the final response."""
+        context = await self.context_loader.load(user_id, self.CONTEXT_SOURCES)
+        prompt = self.build_prompt(context, await self.retrieve_passages(user_id, context))
 
-        moods = await self.db_accessor.get_user_moods(user_id)
-        journals = await self.db_accessor.get_user_journal_entries(user_id)
+        parser = IncrementalJSONParser()
+        async for chunk in self.llm.stream(prompt, **self.cache_args(user_id, context)):
+            for event in parser.feed(chunk):
+                yield event
 
-        print(moods)
-        print(journals)
+        # Same contract as get_cognitive_support: the caller serves the fallback
+        if not parser.result:
+            raise ValueError("Unparseable cognitive support response")
+        yield ("done", None, self.to_response(parser.result))
 
+    def cache_args(self, user_id: str, context: UserContext) -> dict:
+        """Key the response on the user's latest mood/journal ids, so unchanged data is a cache hit."""
+        if context.missing:
+            # Partial context: don't pin an answer built from incomplete data
+            return {}
+        ids = [m.id for m in context.moods] + [j.id for j in context.journals]
+        digest = hashlib.sha256("\x1f".join(ids).encode()).hexdigest()
+        return {
+            "namespace": "cognitive",
+            "cache_key": f"{user_id}:{digest}",
+            "cacheable": lambda text: re.search(r"\{.*\}", text, re.DOTALL) is not None,
+        }
+
+    def retrieval_query(self, context: UserContext) -> str:
+        # What the user is feeling now decides which past passages are relevant
+        parts = [f"{m.mood_value} {m.notes or ''}" for m in context.moods[:5]]
+        parts += [f"{j.title or ''} {j.content[:500]}" for j in context.journals[:2]]
+        return " ".join(parts)
+
+    async def retrieve_passages(self, user_id: str, context: UserContext) -> Optional[List[dict]]:
+        """Top journal passages under the retrieval token budget; None falls back to the full dump."""
+        if self.retriever is None:
+            return None
+        # Same deadline as the context load: a slow index never holds up the answer
+        deadline = getattr(self.context_loader, "deadline", CONTEXT_DEADLINE_SECONDS)
+        try:
+            return await asyncio.wait_for(self.retriever.retrieve(user_id, self.retrieval_query(context)), deadline) or None
+        except Exception as e:
+            logger.warning("❌ Journal retrieval failed, using recent entries: %s", e)
+            return None
+
+    def build_prompt(self, context: UserContext, passages: Optional[List[dict]] = None) -> str:
         mood_text = "\n".join(
-            [f"{m.created_at.date()} | {m.mood_value} ({m.mood_score}) | {m.notes or ''}" for m in moods]
+            [f"{m.created_at.date()} | {m.mood_value} ({m.mood_score}) | {m.notes or ''}" for m in context.moods]
         )
-        journal_text = "\n".join(
-            [f"{j.created_at.date()} | {j.title or 'No Title'} | {j.content}" for j in journals]
+        if passages is not None:
+            journal_text = "\n".join(
+                [f"{p['created_at'][:10]} | {p['title'] or 'No Title'} | {p['text']}" for p in passages]
+            )
+        else:
+            journal_text = "\n".join(
+                [f"{j.created_at.date()} | {j.title or 'No Title'} | {j.content}" for j in context.journals]
+            )
+        insight_text = "\n".join(
+            [f"{i.created_at.date()} | {i.insight_type} | {i.content}" for i in context.insights]
         )
 
         prompt = f"""
@@ -33,6 +120,9 @@ class CognitiveAgent:
         Journal Entries:
         {journal_text}
 
+        Previous Insights:
+        {insight_text or 'None'}
+
         1. Identify cognitive distortions.
         2. Identify stress patterns or emotional triggers.
         3. Suggest one CBT-style coping mechanism.
@@ -45,20 +135,12 @@ class CognitiveAgent:
             "summary": "short emotional insight"
         }}
         """
+        return prompt
 
-        response = self.model.generate_content(prompt)
-
-        print("Generating cognitive support response.")
-        print(response.text)
-
-        try:
-            match = re.search(r"\{.*\}", response.text, re.DOTALL)
-            parsed = json.loads(match.group()) if match else {}
-        except Exception:
-            parsed = {}
-
+    def to_response(self, parsed: dict) -> CognitiveSupportResponse:
         return CognitiveSupportResponse(
-        coping_mechanism=parsed.get("coping_mechanism", ""),
-        cognitive_distortion=parsed.get("cognitive_distortion", ""),
-        stress_patterns=parsed.get("stress_patterns", []),
-    )
+            coping_mechanism=parsed.get("coping_mechanism", ""),
+            cognitive_distortion=parsed.get("cognitive_distortion", ""),
+            stress_patterns=parsed.get("stress_patterns", []),
+            summary=parsed.get("summary", ""),
+        )
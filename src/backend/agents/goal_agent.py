@@ -1,18 +1,33 @@
 # agents/goal_agent.py
 
 class GoalAgent:
-    def __init__(self):
-      self.goals = {}
+    SUGGESTED_GOALS = [
+      "Check in with your mood every day this week 🌱",
+      "Write one journal entry before bed 📓",
+      "Take a 10-minute walk outside 🚶",
+      "Reach out to a friend you haven't talked to in a while 💬",
+    ]
 
-    def set_goal(self, goal: str):
-      self.goals[goal] = False
+    def __init__(self, state):
+      self.state = state
+
+    def set_goal(self, user_id: str, goal: str):
+      self.state.put(user_id, "goals", goal, False)
       return f"New goal added: {goal}"
 
-    def complete_goal(self, goal: str):
-      if goal in self.goals:
-        self.goals[goal] = True
+    def complete_goal(self, user_id: str, goal: str):
+      if self.state.get(user_id, "goals", goal) is not None:
+        self.state.put(user_id, "goals", goal, True)
         return f"🎉 Great job! Goal '{goal}' completed."
       return "Goal not found."
 
-    def get_goals_status(self):
-      return self.goals
+    def get_goals_status(self, user_id: str):
+      return self.state.items(user_id, "goals")
+
+    def suggest_goal(self, user_id: str):
+      # An open goal first, otherwise rotate through the suggestions
+      for goal, done in self.get_goals_status(user_id).items():
+        if not done:
+          return goal
+      count = self.state.incr(user_id, "goal_suggestions")
+      return self.SUGGESTED_GOALS[(count - 1) % len(self.SUGGESTED_GOALS)]
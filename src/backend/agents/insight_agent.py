@@ -1,15 +1,15 @@
 class InsightAgent:
-  def __init__(self):
-    self.entries = []
+  def __init__(self, state):
+    self.state = state
 
-  def log_entry(self, mood: str):
-    self.entries.append(mood)
+  def log_entry(self, user_id: str, mood: str):
+    self.state.append(user_id, "insight_entries", mood)
 
-  def get_insight(self):
-    if not self.entries:
+  def get_insight(self, entries):
+    if not entries:
       return "No entries yet to generate insights."
 
     from collections import Counter
-    mood_freq = Counter(self.entries[-10:])
+    mood_freq = Counter(entries[-10:])
     most_common = mood_freq.most_common(1)[0]
     return f"🔍 Your most frequent mood recently is: {most_common[0]}"
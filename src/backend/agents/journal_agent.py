@@ -1,31 +1,54 @@
+import logging
 import random
 import re
 import json
 
+from metrics import AGENT_CALL_SECONDS, timed
+from resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
 class JournalAgent:
-    def __init__(self, model):
-        self.model = model
+    # Served when Gemini is unavailable or its answer can't be parsed
+    FALLBACK_PROMPTS = [
+        "What is one thing that went well today, and why?",
+        "What emotion did you feel most strongly today? Where did you notice it in your body?",
+        "What is something you're looking forward to?",
+        "What is weighing on your mind right now, and what is one small step you could take?",
+        "Who or what are you grateful for today?",
+    ]
+    FALLBACK_REFLECTION = "Thank you for writing this down. Take a moment to notice how you feel after putting it into words."
 
-    def generate_journal_prompts(self) -> list[str]:
-        print("Generating journal prompts...")
-        prompt = (
+    def __init__(self, llm):
+        self.llm = llm
+
+    def build_prompt(self) -> str:
+        return (
             "Generate a JSON array of exactly 5 reflective and emotionally insightful daily "
             "journal prompts. Each prompt should be a short string. "
             "Return ONLY a valid JSON array, like: "
             '["Prompt 1", "Prompt 2", "Prompt 3", "Prompt 4", "Prompt 5"].'
         )
 
-        response = self.model.generate_content(prompt)
+    @timed(AGENT_CALL_SECONDS)
+    async def generate_journal_prompts(self) -> list[str]:
+        prompt = self.build_prompt()
+
+        try:
+            response = await self.llm.generate(prompt, namespace="journal_prompts", cacheable=lambda text: "[" in text)
+        except Exception as e:
+            logger.warning("❌ Failed to generate journal prompts: %s", e)
+            return self.FALLBACK_PROMPTS
 
         try:
-            text = response.text.strip()
-            print("🔍 Raw Gemini Response:", text)
+            text = response.strip()
+            logger.debug("🔍 Raw Gemini Response: %s", text)
 
             # ✅ 1. Try to extract valid JSON list directly
             match = re.search(r"\[.*\]", text, re.DOTALL)
             if match:
                 parsed = json.loads(match.group())
-                if isinstance(parsed, list):
+                if isinstance(parsed, list) and parsed:
                     return parsed
 
             # ✅ 2. If Gemini gave a single object like {"prompt": "..."}
@@ -40,18 +63,52 @@ class JournalAgent:
                 for line in text.splitlines()
                 if line.strip() and any(c.isalpha() for c in line)
             ]
-            return lines[:5]  # Ensure only 5 prompts
+            return lines[:5] or self.FALLBACK_PROMPTS  # Ensure only 5 prompts
 
         except Exception as e:
-            print("❌ Failed to parse journal prompts:", e)
+            logger.warning("❌ Failed to parse journal prompts: %s", e)
+            return self.FALLBACK_PROMPTS
+
+    @timed(AGENT_CALL_SECONDS)
+    async def generate_journal_prompt_sets(self, mood: str, count: int) -> list[list[str]]:
+        """Generate `count` sets of 5 prompts for a mood bucket in a single call."""
+        prompt = (
+            f"Generate a JSON array of {count} sets of daily journal prompts for someone whose "
+            f"recent mood has been {mood}. Each set is a JSON array of exactly 5 short, reflective "
+            "and emotionally insightful prompts. Return ONLY valid JSON, like: "
+            '[["Prompt 1", "Prompt 2", "Prompt 3", "Prompt 4", "Prompt 5"], ...].'
+        )
+
+        response = await self.llm.generate(prompt)
+
+        try:
+            match = re.search(r"\[.*\]", response, re.DOTALL)
+            parsed = json.loads(match.group()) if match else []
+        except Exception as e:
+            logger.warning("❌ Failed to parse journal prompt sets: %s", e)
             return []
 
-    def get_prompt(self):
-        prompts = self.generate_journal_prompts()
+        return [
+            [str(p) for p in prompt_set][:5]
+            for prompt_set in parsed
+            if isinstance(prompt_set, list) and prompt_set
+        ]
+
+    async def get_prompt(self):
+        prompts = await self.generate_journal_prompts()
         return random.choice(prompts) if prompts else "What are you feeling today?"
 
-    def reflect_on_entry(self, entry: str):
-        response = self.model.generate_content(
-            f"Reflect on this journal entry and provide emotional insights:\n\n{entry}"
-        )
-        return response.text
+    @timed(AGENT_CALL_SECONDS)
+    async def reflect_on_entry(self, entry: str):
+        return await self.llm.generate(self.build_reflection_prompt(entry), namespace="reflection")
+
+    async def stream_reflection(self, entry: str):
+        try:
+            async for chunk in self.llm.stream(self.build_reflection_prompt(entry), namespace="reflection"):
+                yield chunk
+        except CircuitOpenError:
+            # Refused before anything was streamed
+            yield self.FALLBACK_REFLECTION
+
+    def build_reflection_prompt(self, entry: str) -> str:
+        return f"Reflect on this journal entry and provide emotional insights:\n\n{entry}"
@@ -1,16 +1,26 @@
 class MoodAgent:
-  def __init__(self):
-    self.mood_log = []
+  def __init__(self, state):
+    self.state = state  # Shared per-user state store (see state_store.py)
 
-  def log_mood(self, mood: str):
-    self.mood_log.append(mood)
+  def log_mood(self, user_id: str, mood: str):
+    self.state.append(user_id, "moods", mood)
     return f"Mood '{mood}' has been logged."
 
-  def analyze_mood(self):
-    if not self.mood_log:
-      return "No mood data available yet."
+  def get_moods(self, user_id: str, n: int = None):
+    return self.state.recent(user_id, "moods", n)
+
+  def mood_count(self, user_id: str) -> int:
+    return self.state.count(user_id, "moods")
+
+  def is_negative_spiral(self, moods):
     negative_moods = ['sad', 'anxious', 'angry', 'tired']
-    negative_count = sum(1 for m in self.mood_log[-5:] if m.lower() in negative_moods)
-    if negative_count >= 3:
+    negative_count = sum(1 for m in moods[-5:] if m.lower() in negative_moods)
+    return negative_count >= 3
+
+  def analyze_mood(self, moods):
+    # `moods` is oldest first: the recent log or a user's stored history
+    if not moods:
+      return "No mood data available yet."
+    if self.is_negative_spiral(moods):
       return "⚠️ You might be in a negative spiral. Take care of yourself."
     return "You're doing okay! Keep tracking your moods."
@@ -1,14 +1,13 @@
 class WellnessCoachAgent:
-  def __init__(self):
-    self.checkin_count = 0
+  def __init__(self, state):
+    self.state = state
 
-  def suggest_wellness_tip(self):
+  def suggest_wellness_tip(self, user_id: str):
     tips = [
       "Take a deep breath and stretch 🧘",
       "Try a 2-minute meditation 🧠",
       "Step outside for some fresh air 🌳",
       "Drink a glass of water 💧"
     ]
-    suggestion = tips[self.checkin_count % len(tips)]
-    self.checkin_count += 1
-    return suggestion
\ No newline at end of file
+    checkin_count = self.state.incr(user_id, "wellness_tips") - 1
+    return tips[checkin_count % len(tips)]
@@ -0,0 +1,121 @@
+"""Concurrent-request throughput of the Database layer against a local stand-in.
+
+Starts a tiny threaded HTTP server that answers PostgREST-style requests after a
+fixed delay, then fires N concurrent `get_user_moods` calls through:
+
+  * before: the old pattern - a synchronous client call inside `async def`
+  * after:  the async, pooled `database.Database`
+
+Run from src/backend:  python -m benchmarks.bench_database --requests 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1")
+os.environ.setdefault("SUPABASE_KEY", "bench")
+
+from database import Database  # noqa: E402
+from models.schemas import MoodResponse  # noqa: E402
+
+USER_ID = "550e8400-e29b-41d4-a716-446655440000"
+MOOD_ROWS = [
+    {
+        "id": f"00000000-0000-0000-0000-{i:012d}",
+        "user_id": USER_ID,
+        "mood_value": "happy",
+        "mood_score": 7,
+        "notes": None,
+        "created_at": "2025-01-01T09:00:00+00:00",
+    }
+    for i in range(7)
+]
+
+
+def start_stand_in(latency: float) -> ThreadingHTTPServer:
+    body = json.dumps(MOOD_ROWS).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class BlockingDatabase:
+    """Reproduces the previous behaviour: a sync HTTP call inside a coroutine."""
+
+    def __init__(self, url: str):
+        self.client = httpx.Client(base_url=f"{url}/rest/v1")
+
+    async def get_user_moods(self, user_id: str, limit: int = 7):
+        response = self.client.get("/moods", params={"select": "*", "user_id": f"eq.{user_id}", "limit": limit})
+        return [MoodResponse(**mood) for mood in response.json()]
+
+
+async def run(db, requests: int) -> dict:
+    latencies = []
+
+    async def one():
+        start = time.perf_counter()
+        await db.get_user_moods(USER_ID)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+    }
+
+
+async def main(requests: int, latency: float):
+    server = start_stand_in(latency)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    before = BlockingDatabase(url)
+    after = Database(url=url, key="bench")
+    try:
+        results = {
+            "before": await run(before, requests),
+            "after": await run(after, requests),
+        }
+    finally:
+        before.client.close()
+        await after.close()
+        server.shutdown()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in backend latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency))
@@ -0,0 +1,102 @@
+"""Full-history export: materialized list vs streamed NDJSON.
+
+Seeds the Supabase stand-in with years of moods and journal entries for one
+user, then exports them through the real Database class two ways:
+
+  * before: fetch every row, build Pydantic models, serialize one JSON body
+  * after:  export.export_ndjson over keyset-paged reads (and gzip_chunks)
+
+Reports time to first byte, total time, bytes and peak traced memory.
+
+Run from src/backend:  python -m benchmarks.bench_export --years 5 --entries-per-day 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.stand_ins import FakeSupabase, isolate_state
+
+USER_ID = "550e8400-e29b-41d4-a716-446655440000"
+WORDS = "work family sleep anxious calm run walk coffee friend deadline exam project dinner rain gym".split()
+
+
+def seed(supabase: FakeSupabase, days: int, per_day: int, words: int):
+    rng = random.Random(1)
+    now = datetime.now(timezone.utc)
+    for day in range(days, 0, -1):
+        for i in range(per_day):
+            created_at = (now - timedelta(days=day, minutes=i * 7)).isoformat()
+            supabase.insert("moods", {"user_id": USER_ID, "mood_value": "calm", "mood_score": rng.randint(1, 10), "created_at": created_at})
+        supabase.insert("journal_entries", {
+            "user_id": USER_ID, "title": f"Day {day}", "content": " ".join(rng.choices(WORDS, k=words)),
+            "created_at": (now - timedelta(days=day)).isoformat(),
+        })
+
+
+async def materialized(db) -> tuple:
+    from models.schemas import JournalEntryResponse, MoodResponse
+
+    rows = {"moods": [], "journal_entries": []}
+    for table in rows:
+        async for page in db.iter_user_rows(table, USER_ID):
+            rows[table].extend(page)
+    body = json.dumps({
+        "moods": [MoodResponse(**r).model_dump(mode="json") for r in rows["moods"]],
+        "journal_entries": [JournalEntryResponse(**r).model_dump(mode="json") for r in rows["journal_entries"]],
+    }).encode()
+    yield body
+
+
+async def measure(chunks) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    size = 0
+    async for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "first_byte_ms": round(first * 1000, 1),
+        "total_ms": round(total * 1000, 1),
+        "bytes": size,
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+    }
+
+
+async def run(years: int, per_day: int, words: int, latency: float):
+    isolate_state()
+    from database import Database
+    from export import export_ndjson, gzip_chunks
+
+    supabase = FakeSupabase(latency=latency, jitter=0)
+    days = years * 365
+    seed(supabase, days, per_day, words)
+    db = Database(transport=supabase.transport())
+    types = ["mood", "journal_entry"]
+    try:
+        results = {
+            "before_materialized_json": await measure(materialized(db)),
+            "after_streamed_ndjson": await measure(export_ndjson(db, USER_ID, types)),
+            "after_streamed_ndjson_gzip": await measure(gzip_chunks(export_ndjson(db, USER_ID, types))),
+        }
+    finally:
+        await db.close()
+    print(json.dumps({"moods": days * per_day, "journal_entries": days, "db_latency_s": latency, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--entries-per-day", type=int, default=4, help="mood check-ins per day")
+    parser.add_argument("--words", type=int, default=200, help="words per journal entry")
+    parser.add_argument("--latency", type=float, default=0.01, help="stand-in Supabase round trip (s)")
+    args = parser.parse_args()
+    asyncio.run(run(args.years, args.entries_per_day, args.words, args.latency))
@@ -0,0 +1,266 @@
+"""End-to-end load test of main.app against in-process Supabase and Gemini stand-ins.
+
+Boots the real application (lifespan included) with `database.db` pointed at
+benchmarks.stand_ins.FakeSupabase and `get_gemini_model` returning a
+FakeGeminiModel, seeds a user's history, then drives a weighted mix of
+scenarios from `--concurrency` closed-loop clients through the ASGI stack:
+
+  checkin_burst   3-5 back-to-back POST /mood-checkin
+  journal_write   POST /journal
+  cognitive       POST /cognitiveSupport
+  trend           GET /moods/weekly-trend
+  analytics       GET /moods/analytics
+  history         GET /moods and GET /journal (first page)
+  insights        GET /insights
+  prompts         GET /journal-prompt and GET /affirmation-quote
+
+Prints (and with --output writes) JSON with throughput and p50/p95/p99 per
+route. --compare BASELINE.json adds per-route deltas against an earlier run
+and --max-regression PCT exits non-zero when any route's p95 got worse by
+more than PCT percent, so two commits can be compared like for like.
+
+Run from src/backend:
+  python -m benchmarks.bench_load --duration 30 --concurrency 32 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from benchmarks.stand_ins import FakeGeminiModel, FakeSupabase, boot_app, isolate_state
+
+USER_ID = "550e8400-e29b-41d4-a716-446655440000"
+MOODS = [("happy", 8), ("calm", 7), ("anxious", 4), ("sad", 3), ("stressed", 3), ("excited", 9)]
+WORDS = (
+    "work family sleep anxious calm run walk coffee friend deadline exam project meeting sister "
+    "dinner weekend rain sunshine gym meditate breathe tired grateful happy sad stress music garden"
+).split()
+DEFAULT_MIX = "checkin_burst=25,journal_write=10,cognitive=10,trend=20,analytics=5,history=15,insights=10,prompts=5"
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, weight = item.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed(supabase: FakeSupabase, days: int, rng: random.Random):
+    now = datetime.now(timezone.utc)
+    supabase.insert("users", {"id": USER_ID, "email": "test@mindgarden.com", "username": "testuser"})
+    for day in range(days, 0, -1):
+        for hour in (9, 14, 21):
+            value, score = rng.choice(MOODS)
+            created_at = (now - timedelta(days=day)).replace(hour=hour).isoformat()
+            supabase.insert("moods", {"user_id": USER_ID, "mood_value": value, "mood_score": score, "notes": None, "created_at": created_at})
+        supabase.insert("journal_entries", {
+            "user_id": USER_ID,
+            "title": f"Day {days - day}",
+            "content": " ".join(rng.choices(WORDS, k=150)),
+            "created_at": (now - timedelta(days=day)).replace(hour=22).isoformat(),
+        })
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.recording = False
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str, **kwargs):
+        route = f"{method} {url.split('?')[0]}"
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        if self.recording:
+            self.latencies[route].append(time.perf_counter() - started)
+            if not ok:
+                self.errors[route] += 1
+
+
+async def checkin_burst(client, recorder, rng):
+    for _ in range(rng.randint(3, 5)):
+        value, score = rng.choice(MOODS)
+        await recorder.request(client, "POST", "/mood-checkin", json={"mood_value": value, "mood_score": score})
+
+
+async def journal_write(client, recorder, rng):
+    await recorder.request(client, "POST", "/journal", json={"title": "Today", "content": " ".join(rng.choices(WORDS, k=rng.randint(40, 400)))})
+
+
+async def cognitive(client, recorder, rng):
+    await recorder.request(client, "POST", "/cognitiveSupport")
+
+
+async def trend(client, recorder, rng):
+    await recorder.request(client, "GET", "/moods/weekly-trend")
+
+
+async def analytics(client, recorder, rng):
+    await recorder.request(client, "GET", "/moods/analytics?granularity=day&window=7")
+
+
+async def history(client, recorder, rng):
+    await recorder.request(client, "GET", "/moods?limit=30")
+    await recorder.request(client, "GET", "/journal?limit=20")
+
+
+async def insights(client, recorder, rng):
+    await recorder.request(client, "GET", "/insights")
+
+
+async def prompts(client, recorder, rng):
+    mood = rng.choice(MOODS)[0]
+    await recorder.request(client, "GET", f"/journal-prompt?mood={mood}")
+    await recorder.request(client, "GET", f"/affirmation-quote?mood={mood}")
+
+
+SCENARIOS = {f.__name__: f for f in (checkin_burst, journal_write, cognitive, trend, analytics, history, insights, prompts)}
+
+
+async def drive(app, mix: dict, concurrency: int, duration: float, warmup: float, seed_value: int) -> tuple:
+    recorder = Recorder()
+    names, weights = list(mix), list(mix.values())
+    deadline = None
+
+    async def client_loop(client, index):
+        rng = random.Random(seed_value * 1000 + index)
+        while deadline is None or time.perf_counter() < deadline:
+            await SCENARIOS[rng.choices(names, weights)[0]](client, recorder, rng)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        tasks = [asyncio.create_task(client_loop(client, i)) for i in range(concurrency)]
+        await asyncio.sleep(warmup)
+        recorder.recording = True
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        stats = (await client.get("/stats")).json()
+    return recorder, elapsed, stats
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    for route, samples in sorted(recorder.latencies.items()):
+        routes[route] = {
+            "requests": len(samples),
+            "errors": recorder.errors[route],
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+            "max_ms": round(max(samples) * 1000, 2),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    return {"requests": total, "throughput_rps": round(total / elapsed, 2), "routes": routes}
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    def delta(now, then):
+        return round(100 * (now - then) / then, 1) if then else None
+
+    deltas = {}
+    for route, now in current["routes"].items():
+        then = baseline["routes"].get(route)
+        if then is None:
+            continue
+        deltas[route] = {
+            f"{metric}_change_pct": delta(now[metric], then[metric])
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return {
+        "baseline_commit": baseline.get("commit"),
+        "throughput_change_pct": delta(current["throughput_rps"], baseline["throughput_rps"]),
+        "routes": deltas,
+    }
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    supabase = FakeSupabase(args.db_latency, args.db_jitter, args.db_failure_rate, seed=args.seed)
+    seed(supabase, args.history_days, rng)
+    gemini = FakeGeminiModel(args.llm_latency, args.llm_jitter, args.llm_failure_rate, seed=args.seed)
+
+    isolate_state()
+    main = boot_app(supabase, gemini)
+
+    async with main.app.router.lifespan_context(main.app):
+        recorder, elapsed, stats = await drive(main.app, parse_mix(args.mix), args.concurrency, args.duration, args.warmup, args.seed)
+
+    result = {
+        "commit": git_commit(),
+        "config": {
+            "mix": args.mix, "concurrency": args.concurrency, "duration_s": args.duration, "seed": args.seed,
+            "db": {"latency_s": args.db_latency, "jitter": args.db_jitter, "failure_rate": args.db_failure_rate},
+            "llm": {"latency_s": args.llm_latency, "jitter": args.llm_jitter, "failure_rate": args.llm_failure_rate},
+        },
+        **summarize(recorder, elapsed),
+        "stand_ins": {"supabase_requests": supabase.requests, "supabase_failures": supabase.failures, "gemini": gemini.stats()},
+        "llm_gateway": stats.get("llm"),
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            result["comparison"] = compare(result, json.load(f))
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare and args.max_regression is not None:
+        worse = {
+            route: d["p95_ms_change_pct"]
+            for route, d in result["comparison"]["routes"].items()
+            if d["p95_ms_change_pct"] is not None and d["p95_ms_change_pct"] > args.max_regression
+        }
+        if worse:
+            print(f"p95 regressed by more than {args.max_regression}%: {worse}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop clients")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, name=weight,...")
+    parser.add_argument("--history-days", type=int, default=60, help="days of seeded moods and journal entries")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db-latency", type=float, default=0.01, help="median Supabase round trip (s)")
+    parser.add_argument("--db-jitter", type=float, default=0.3, help="log-normal sigma of Supabase latency")
+    parser.add_argument("--db-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="median Gemini call (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.5, help="log-normal sigma of Gemini latency")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.02)
+    parser.add_argument("--output", help="write the JSON result here")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--max-regression", type=float, help="with --compare, exit 1 if any route's p95 grows more than this %%")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""Latency of GET /moods/analytics over a year of check-ins.
+
+Seeds the Supabase stand-in with one user's year of moods, then times
+`Database.get_mood_analytics` over the whole year for every granularity -
+the reads (with the stand-in's round-trip latency) plus the vectorized
+bucketing - and checks each stays under the latency budget. The stand-in's
+own CPU time scanning its in-memory table (which a real database does with an
+index, off our event loop) is subtracted and reported as `stand_in_ms`. The
+bucketing alone (`to_datetime64` + `aggregate_moods` on the fetched arrays)
+and the number of Supabase round trips are reported alongside.
+
+Run from src/backend:  python -m benchmarks.bench_mood_analytics --per-day 20 --latency 0.01 --budget-ms 100
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from benchmarks.stand_ins import FakeSupabase, isolate_state
+
+USER_ID = "550e8400-e29b-41d4-a716-446655440000"
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=365)
+
+
+def seed(supabase: FakeSupabase, per_day: int):
+    for s in sorted(random.randrange(365 * 86400) for _ in range(365 * per_day)):
+        supabase.insert("moods", {
+            "user_id": USER_ID, "mood_value": "calm", "mood_score": random.randint(1, 10),
+            "created_at": (START + timedelta(seconds=s)).isoformat(),
+        })
+
+
+async def run(per_day: int, latency: float, budget_ms: float, repeat: int) -> bool:
+    isolate_state()
+    from database import Database
+    from mood_analytics import GRANULARITIES, aggregate_moods, to_datetime64
+
+    supabase = FakeSupabase(latency=latency, jitter=0)
+    seed(supabase, per_day)
+    rows = supabase.tables["moods"]
+    scores, timestamps = np.array([r["mood_score"] for r in rows]), [r["created_at"] for r in rows]
+    db = Database(transport=supabase.transport())
+    results = {"rows": len(rows), "db_latency_s": latency, "budget_ms": budget_ms, "granularities": {}}
+    ok = True
+
+    try:
+        for granularity in GRANULARITIES:
+            best, stand_in, requests = float("inf"), 0.0, 0
+            for _ in range(repeat):
+                requests, busy = supabase.requests, supabase.busy_seconds
+                started = time.perf_counter()
+                response = await db.get_mood_analytics(USER_ID, START, END, granularity, window=7)
+                elapsed = (time.perf_counter() - started) * 1000
+                busy = (supabase.busy_seconds - busy) * 1000
+                if elapsed - busy < best:
+                    best, stand_in = elapsed - busy, busy
+                requests = supabase.requests - requests
+
+            bucketing = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                aggregate_moods(scores, to_datetime64(timestamps), granularity, window=7)
+                bucketing = min(bucketing, (time.perf_counter() - started) * 1000)
+
+            results["granularities"][granularity] = {
+                "buckets": len(response.trend),
+                "best_ms": round(best, 2),
+                "stand_in_ms": round(stand_in, 2),
+                "round_trips": requests,
+                "bucketing_ms": round(bucketing, 2),
+            }
+            ok = ok and best <= budget_ms
+    finally:
+        await db.close()
+
+    results["within_budget"] = ok
+    print(json.dumps(results, indent=2))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-day", type=int, default=20, help="check-ins per day")
+    parser.add_argument("--latency", type=float, default=0.01, help="stand-in Supabase round trip (s)")
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.per_day, args.latency, args.budget_ms, args.repeat)) else 1)
@@ -0,0 +1,102 @@
+"""Cognitive-support prompt size: full journal dump vs retrieved passages.
+
+For users with increasingly verbose journals, compares the journal section of
+the prompt built from the 7 most recent full entries (the old behaviour)
+against the top passages retrieved from the per-user vector index under
+RETRIEVAL_TOKEN_BUDGET. Reports estimated prompt tokens for both and the
+time spent embedding + querying. Gemini latency grows with input tokens, so
+the token reduction is the latency/cost reduction to expect from the model.
+
+Run from src/backend:  python -m benchmarks.bench_retrieval --words 80 400 1500
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from agents.cognitive_agent import CognitiveAgent
+from context_loader import UserContext
+from vector_index import RETRIEVAL_TOKEN_BUDGET, HashingEmbedder, JournalRetriever, estimate_tokens
+
+WORDS = (
+    "work family sleep anxious calm run walk coffee friend deadline exam project meeting sister brother "
+    "mother father dinner weekend rain sunshine gym meditate breathe tired grateful happy sad stress "
+    "therapy music book movie garden cook travel beach mountain call message lonely proud excited"
+).split()
+MOODS = ["happy", "sad", "anxious", "calm", "stressed", "excited"]
+
+
+class FakeDatabase:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def iter_user_journal_entries(self, user_id, inserted_since=None):
+        yield self.rows
+
+
+def make_user(entries: int, words_per_entry: int):
+    now = datetime.now(timezone.utc)
+    journals = [
+        SimpleNamespace(
+            id=f"entry-{i}",
+            title=f"Day {i}",
+            content=" ".join(random.choices(WORDS, k=words_per_entry)),
+            created_at=now - timedelta(days=entries - i),
+        )
+        for i in range(entries)
+    ]
+    moods = [
+        SimpleNamespace(created_at=now - timedelta(days=i), mood_value=random.choice(MOODS), mood_score=random.randint(1, 10), notes="deadline at work")
+        for i in range(7)
+    ]
+    rows = [{"id": j.id, "title": j.title, "content": j.content, "created_at": j.created_at.isoformat()} for j in journals]
+    # get_user_journal_entries returns the newest 7
+    return UserContext(moods=moods, journals=journals[::-1][:7]), rows
+
+
+async def run(words_options, entries: int, repeat: int):
+    results = {}
+    for words in words_options:
+        context, rows = make_user(entries, words)
+        with tempfile.TemporaryDirectory() as tmp:
+            retriever = JournalRetriever(FakeDatabase(rows), HashingEmbedder(), index_dir=tmp)
+            agent = CognitiveAgent(llm=None, context_loader=None, retriever=retriever)
+
+            started = time.perf_counter()
+            await retriever.build("bench-user")
+            index_s = time.perf_counter() - started
+
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                passages = await agent.retrieve_passages("bench-user", context)
+                samples.append((time.perf_counter() - started) * 1000)
+
+        full_prompt = agent.build_prompt(context)
+        retrieved_prompt = agent.build_prompt(context, passages)
+        full_tokens = estimate_tokens(full_prompt)
+        retrieved_tokens = estimate_tokens(retrieved_prompt)
+        results[words] = {
+            "index_build_s": round(index_s, 2),
+            "full_dump_prompt_tokens": full_tokens,
+            "retrieval_prompt_tokens": retrieved_tokens,
+            "token_reduction_pct": round(100 * (1 - retrieved_tokens / full_tokens), 1),
+            "passages": len(passages or []),
+            "retrieval_p50_ms": round(statistics.median(samples), 2),
+        }
+
+    print(json.dumps({"entries": entries, "token_budget": RETRIEVAL_TOKEN_BUDGET, "words_per_entry": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, nargs="+", default=[80, 400, 1500], help="words per entry")
+    parser.add_argument("--entries", type=int, default=365, help="journal entries per user")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.words, args.entries, args.repeat))
@@ -0,0 +1,105 @@
+"""Query latency of the journal search index at 10k and 100k entries.
+
+Builds indexes over synthetic journal entries, then times single-term,
+multi-term and prefix queries, plus persisting and reloading the index.
+`loop_stall_ms` is the longest the event loop went without running while
+the queries ran the way the service runs them, in a worker thread.
+
+Run from src/backend:  python -m benchmarks.bench_search_index --sizes 10000 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from search_index import JournalSearchIndex
+
+WORDS = (
+    "work family sleep anxious calm run walk coffee friend deadline exam project meeting sister brother "
+    "mother father dinner weekend rain sunshine gym meditate breathe tired grateful happy sad stress "
+    "therapy music book movie garden cook travel beach mountain call message lonely proud excited"
+).split()
+QUERIES = ["anxious", "work deadline", "sister dinner weekend", "medit", "grat", "coffee friend ru"]
+
+
+def build(size: int, words_per_entry: int) -> JournalSearchIndex:
+    index = JournalSearchIndex()
+    for i in range(size):
+        content = " ".join(random.choices(WORDS, k=words_per_entry))
+        index.add(f"entry-{i}", f"Day {i}", content, f"2025-01-01T00:00:{i % 60:02d}+00:00")
+    return index
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def loop_stall(index: JournalSearchIndex, repeat: int) -> float:
+    stalls = []
+
+    async def tick():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - started)
+
+    ticker = asyncio.create_task(tick())
+    for _ in range(repeat):
+        for query in QUERIES:
+            await asyncio.to_thread(index.search, query, 10)
+    ticker.cancel()
+    return max(stalls) * 1000
+
+
+def main(sizes, words_per_entry: int, repeat: int):
+    results = {}
+    for size in sizes:
+        started = time.perf_counter()
+        index = build(size, words_per_entry)
+        build_s = time.perf_counter() - started
+
+        queries = {}
+        for query in QUERIES:
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                index.search(query, limit=10)
+                samples.append((time.perf_counter() - started) * 1000)
+            queries[query] = {"p50_ms": round(statistics.median(samples), 2), "p95_ms": round(percentile(samples, 0.95), 2)}
+
+        stall_ms = asyncio.run(loop_stall(index, repeat))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.idx.gz")
+            started = time.perf_counter()
+            JournalSearchIndex.write(path, index.to_dict())
+            save_s = time.perf_counter() - started
+            size_bytes = os.path.getsize(path)
+            started = time.perf_counter()
+            JournalSearchIndex.load(path)
+            load_s = time.perf_counter() - started
+
+        results[size] = {
+            "build_s": round(build_s, 2),
+            "save_s": round(save_s, 2),
+            "load_s": round(load_s, 2),
+            "file_mb": round(size_bytes / 1e6, 2),
+            "queries": queries,
+            "loop_stall_ms": round(stall_ms, 2),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--words", type=int, default=80, help="words per entry")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.sizes, args.words, args.repeat)
@@ -0,0 +1,44 @@
+"""Throughput of the local lexicon sentiment scorer.
+
+Run from src/backend:  python -m benchmarks.bench_sentiment --entries 10000 --batch-size 64
+"""
+import argparse
+import json
+import random
+import time
+
+from sentiment import LEXICON, LexiconSentimentScorer
+
+FILLER = "today work home walk dinner talked with my sister about the week and then went to bed early".split()
+
+
+def synthetic_entry(words: int) -> str:
+    vocab = FILLER + list(LEXICON) + ["not", "never"]
+    return " ".join(random.choice(vocab) for _ in range(words))
+
+
+def main(entries: int, batch_size: int, words: int):
+    texts = [synthetic_entry(words) for _ in range(entries)]
+    scorer = LexiconSentimentScorer()
+
+    started = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        scorer.score_texts(texts[i:i + batch_size])
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "entries": entries,
+        "batch_size": batch_size,
+        "words_per_entry": words,
+        "seconds": round(elapsed, 3),
+        "entries_per_second": round(entries / elapsed, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--words", type=int, default=200)
+    args = parser.parse_args()
+    main(args.entries, args.batch_size, args.words)
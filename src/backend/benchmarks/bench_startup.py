@@ -0,0 +1,103 @@
+"""Cold-start cost of a worker: imports, lifespan start-up and first requests.
+
+Each run is a fresh interpreter (as a new uvicorn worker or container would
+be) that imports the app against the in-process stand-ins, enters the
+lifespan, then sends each probe request twice; the gap between the first and
+second request is the cost of whatever the route initializes on first use
+(the Supabase client, the Gemini model, agents). The Gemini SDK import is
+timed separately, since the stand-in model doesn't need it.
+
+Before the probes the worker sits idle for `--idle` seconds, and the work it
+did in the background meanwhile is reported (`idle_*`: agents built, Gemini
+model created, Gemini calls made), since none of it shows up in the timings.
+
+Run from src/backend:  python -m benchmarks.bench_startup --runs 5 [--warmup] [--idle 1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROBES = [
+    ("GET", "/"),
+    ("GET", "/ready"),
+    ("GET", "/moods?limit=30"),
+    ("GET", "/garden-status"),
+    ("POST", "/cognitiveSupport?fresh=true"),
+]
+
+
+async def child(idle: float):
+    import httpx
+
+    from benchmarks.stand_ins import FakeGeminiModel, FakeSupabase, boot_app, isolate_state
+
+    isolate_state()
+    gemini = FakeGeminiModel(latency=0)
+    started = time.perf_counter()
+    main = boot_app(FakeSupabase(latency=0), gemini)
+    result = {"import_ms": (time.perf_counter() - started) * 1000}
+
+    started = time.perf_counter()
+    async with main.app.router.lifespan_context(main.app):
+        result["lifespan_startup_ms"] = (time.perf_counter() - started) * 1000
+        await asyncio.sleep(idle)
+        result["idle_agents_built"] = sum(name in vars(main.coordinator) for name in main.coordinator.AGENTS)
+        result["idle_model_created"] = int(main.llm.model is not None)
+        result["idle_llm_calls"] = gemini.calls
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            if main.STARTUP_WARMUP:
+                started = time.perf_counter()
+                while (await client.get("/ready")).status_code != 200:
+                    await asyncio.sleep(0.005)
+                result["ready_after_ms"] = (time.perf_counter() - started) * 1000
+            for method, url in PROBES:
+                for attempt in ("first", "second"):
+                    started = time.perf_counter()
+                    await client.request(method, url)
+                    result[f"{method} {url.split('?')[0]} {attempt}_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    try:
+        import google.generativeai  # noqa: F401
+        result["gemini_sdk_import_ms"] = (time.perf_counter() - started) * 1000
+    except ImportError:
+        result["gemini_sdk_import_ms"] = None
+    print(json.dumps(result))
+
+
+def run(runs: int, warmup: bool, idle: float):
+    env = {**os.environ, "STARTUP_WARMUP": "true" if warmup else "false"}
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--idle", str(idle)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        sample = json.loads(out.strip().splitlines()[-1])
+        sample["process_total_ms"] = (time.perf_counter() - started) * 1000
+        samples.append(sample)
+
+    medians = {}
+    for key in samples[0]:
+        values = [s[key] for s in samples if s.get(key) is not None]
+        medians[key] = round(statistics.median(values), 2) if values else None
+    print(json.dumps({"runs": runs, "startup_warmup": warmup, "idle_s": idle, "median": medians}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="start workers with STARTUP_WARMUP=true")
+    parser.add_argument("--idle", type=float, default=0.5, help="seconds to sit idle before the probes")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child(args.idle))
+    else:
+        run(args.runs, args.warmup, args.idle)
@@ -0,0 +1,314 @@
+"""In-process stand-ins for Supabase (PostgREST) and Gemini, for benchmarks.
+
+FakeSupabase keeps tables in memory and answers the subset of PostgREST the
+Database class uses (select/filters/order/limit, keyset `or`, inserts with
+on_conflict + ignore-duplicates, the mood rollup trigger and the sentiment
+RPC) through an
+httpx.MockTransport, so `Database(transport=...)` runs unmodified.
+
+FakeGeminiModel implements `generate_content_async` (plain and streamed) and
+answers each agent's prompt with a response of the shape that agent parses.
+Both sample their latency from a log-normal distribution (`latency` is the
+median, `jitter` the sigma) and fail a `failure_rate` fraction of calls.
+"""
+import asyncio
+import functools
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import httpx
+
+from mood_rollups import rollup_day
+
+TIMESTAMP_COLUMNS = ("created_at", "updated_at", "inserted_at")
+KEYSET = re.compile(r'^\(created_at\.(gt|lt)\."(.+?)",and\(created_at\.eq\."(.+?)",id\.(gt|lt)\.(.+)\)\)$')
+COMPARE = {
+    "eq": lambda a, b: a == b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+
+def isolate_state(prefix: str = "mindgarden-bench-") -> str:
+    """Stand-in credentials and throwaway state paths; call before importing app modules."""
+    state_dir = tempfile.mkdtemp(prefix=prefix)
+    os.environ.setdefault("SUPABASE_URL", "http://fake-supabase")
+    os.environ.setdefault("SUPABASE_KEY", "bench")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    for name, path in (
+        ("LLM_CACHE_PATH", "llm_cache.db"),
+        ("VECTOR_INDEX_DIR", "vector_index"),
+        ("SEARCH_INDEX_DIR", "search_index"),
+        ("STATE_SQLITE_PATH", "agent_state.db"),
+        ("WRITE_BEHIND_SPILL_PATH", "mood_write_behind.jsonl"),
+        ("SENTIMENT_SWEEP_LOCK_PATH", "sentiment_sweep.lock"),
+    ):
+        os.environ.setdefault(name, os.path.join(state_dir, path))
+    return state_dir
+
+
+def boot_app(supabase: "FakeSupabase", gemini: "FakeGeminiModel"):
+    """Import main with its database on `supabase` and its Gemini model `gemini`."""
+    import database
+
+    # database.db hasn't created its client yet; swap it before main binds it
+    database.db = database.Database(transport=supabase.transport())
+    import main
+
+    main.get_gemini_model = lambda: gemini
+    return main
+
+
+def sample_latency(rng: random.Random, latency: float, jitter: float) -> float:
+    if latency <= 0:
+        return 0.0
+    return latency * math.exp(rng.gauss(0, jitter)) if jitter > 0 else latency
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _coerce(column: str, value):
+    # Cached: every filtered read re-parses each row's timestamps, which would
+    # otherwise dominate the timings of the code under test
+    if column in TIMESTAMP_COLUMNS and isinstance(value, str):
+        return _parse_timestamp(value)
+    return value
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeSupabase:
+    """In-memory PostgREST tables behind an httpx transport."""
+
+    DEFAULTS = {
+        "moods": {"notes": None},
+        "journal_entries": {"title": None, "sentiment_score": None},
+        "insights": {"data": None},
+    }
+
+    def __init__(self, latency: float = 0.01, jitter: float = 0.3, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.tables: Dict[str, List[dict]] = {
+            "users": [], "moods": [], "journal_entries": [], "insights": [], "mood_daily_rollups": [],
+        }
+        self._rollups: Dict[tuple, dict] = {}
+        self._rng = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def insert(self, table: str, row: dict) -> dict:
+        row = {**self.DEFAULTS.get(table, {}), **row}
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", _now())
+        if table == "journal_entries":
+            row.setdefault("updated_at", row["created_at"])
+            row.setdefault("inserted_at", _now())
+        self.tables[table].append(row)
+        if table == "moods":
+            self._roll_up(row)
+        return row
+
+    def _roll_up(self, mood: dict):
+        # What the moods_daily_rollup trigger does for each stored check-in
+        key = (mood["user_id"], rollup_day(mood["created_at"]))
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            rollup = self._rollups[key] = {"user_id": key[0], "day": key[1], "score_sum": 0, "score_count": 0}
+            self.tables["mood_daily_rollups"].append(rollup)
+        rollup["score_sum"] += mood["mood_score"]
+        rollup["score_count"] += 1
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(sample_latency(self._rng, self.latency, self.jitter))
+        started = time.perf_counter()
+        try:
+            return self._respond(request)
+        finally:
+            # Scanning in-memory tables blocks the loop the code under test runs
+            # on; benchmarks report this separately from their own timings
+            self.busy_seconds += time.perf_counter() - started
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        if self._rng.random() < self.failure_rate:
+            self.failures += 1
+            return httpx.Response(503, json={"message": "fake Supabase failure"})
+
+        path = request.url.path.split("/rest/v1/", 1)[-1]
+        params = list(request.url.params.multi_items())
+        if path.startswith("rpc/"):
+            return self._rpc(path[4:], json.loads(request.content))
+        if path not in self.tables:
+            return httpx.Response(404, json={"message": f"relation {path} does not exist"})
+        if request.method == "GET":
+            return httpx.Response(200, json=self._select(path, params))
+        if request.method == "POST":
+            body = json.loads(request.content)
+            rows = body if isinstance(body, list) else [body]
+            conflict = dict(params).get("on_conflict")
+            return httpx.Response(201, json=self._insert(path, rows, conflict.split(",") if conflict else None))
+        return httpx.Response(405)
+
+    def _rpc(self, function: str, args: dict) -> httpx.Response:
+        if function == "set_sentiment_scores":
+            scores = {s["id"]: s["score"] for s in args["p_scores"]}
+            for row in self.tables["journal_entries"]:
+                if row["id"] in scores:
+                    row["sentiment_score"] = scores[row["id"]]
+        else:
+            return httpx.Response(404, json={"message": f"function {function} does not exist"})
+        return httpx.Response(204)
+
+    def _insert(self, table: str, rows: List[dict], conflict: Optional[List[str]]) -> List[dict]:
+        existing = {tuple(r.get(c) for c in conflict) for r in self.tables[table]} if conflict else set()
+        created = []
+        for row in rows:
+            if conflict:
+                key = tuple(row.get(c) for c in conflict)
+                if key in existing:
+                    continue  # resolution=ignore-duplicates
+                existing.add(key)
+            created.append(dict(self.insert(table, dict(row))))
+        return created
+
+    def _select(self, table: str, params: list) -> List[dict]:
+        columns, order, limit, predicates = "*", None, None, []
+        for name, value in params:
+            if name == "select":
+                columns = value
+            elif name == "order":
+                order = value
+            elif name == "limit":
+                limit = int(value)
+            elif name == "or":
+                predicates.append(self._keyset(value))
+            else:
+                predicates.append(self._filter(name, value))
+
+        rows = [r for r in self.tables[table] if all(p(r) for p in predicates)]
+        if order:
+            # Stable sorts applied last key first give a multi-column order
+            for part in reversed(order.split(",")):
+                column, _, direction = part.partition(".")
+                rows.sort(key=lambda r: _coerce(column, r.get(column)), reverse=direction == "desc")
+        if limit is not None:
+            rows = rows[:limit]
+        if columns != "*":
+            names = columns.split(",")
+            rows = [{c: r.get(c) for c in names} for r in rows]
+        return rows
+
+    @staticmethod
+    def _filter(column: str, spec: str):
+        op, _, value = spec.partition(".")
+        if op == "is" and value == "null":
+            return lambda r: r.get(column) is None
+        if op == "in":
+            values = {v.strip('"') for v in value.strip("()").split(",")}
+            return lambda r: r.get(column) in values
+        compare = COMPARE[op]
+        value = _coerce(column, value)
+        return lambda r: r.get(column) is not None and compare(_coerce(column, r.get(column)), value)
+
+    @staticmethod
+    def _keyset(spec: str):
+        # (created_at.gt."T",and(created_at.eq."T",id.gt.ID)) as written by Database._select_pages/_select_page
+        match = KEYSET.match(spec)
+        if match is None:
+            raise ValueError(f"Unsupported or filter: {spec}")
+        op, created_at, _, id_op, row_id = match.groups()
+        created_at = _coerce("created_at", created_at)
+        before = COMPARE[op]
+        return lambda r: before(_coerce("created_at", r["created_at"]), created_at) or (
+            _coerce("created_at", r["created_at"]) == created_at and COMPARE[id_op](r["id"], row_id)
+        )
+
+
+class FakeGeminiModel:
+    """Answers agent prompts with well-formed responses after a sampled delay."""
+
+    def __init__(self, latency: float = 1.0, jitter: float = 0.4, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def respond(self, prompt: str) -> str:
+        count = re.search(r"JSON array of (?:exactly )?(\d+)", prompt)
+        count = int(count.group(1)) if count else 5
+        if '"coping_mechanism"' in prompt:
+            return json.dumps({
+                "cognitive_distortion": "Catastrophizing",
+                "stress_patterns": ["Work deadlines", "Short sleep"],
+                "coping_mechanism": "Write down the worry, then one realistic outcome and one next step.",
+                "summary": "Stress rises before deadlines and eases after exercise.",
+            })
+        if "sets of daily journal prompts" in prompt:
+            return json.dumps([[f"Set {s} prompt {i}?" for i in range(1, 6)] for s in range(count)])
+        if "journal prompts" in prompt:
+            return json.dumps([f"What is one thing that went well today ({i})?" for i in range(1, 6)])
+        if "Rate the sentiment" in prompt:
+            return json.dumps([round(self._rng.uniform(-1, 1), 2) for _ in range(count)])
+        if "JSON array" in prompt and "affirmation" in prompt:
+            return json.dumps([f"You are growing every day ({i})." for i in range(count)])
+        if "affirmation" in prompt:
+            return "You are capable of amazing things. Trust in your journey."
+        return "It sounds like today asked a lot of you. Noticing that is already a step toward caring for yourself."
+
+    @staticmethod
+    def _response(text: str, usage):
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        delay = sample_latency(self._rng, self.latency, self.jitter)
+        fail = self._rng.random() < self.failure_rate
+        text = self.respond(prompt)
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+        if not stream:
+            await asyncio.sleep(delay)
+            if fail:
+                self.failures += 1
+                raise RuntimeError("fake Gemini failure")
+            return self._response(text, usage)
+
+        # Streams: about a third of the time to the first chunk, the rest spread over the chunks
+        await asyncio.sleep(delay / 3)
+        if fail:
+            self.failures += 1
+            raise RuntimeError("fake Gemini failure")
+        pieces = [text[i:i + 40] for i in range(0, len(text), 40)]
+
+        async def chunks():
+            for piece in pieces:
+                await asyncio.sleep(delay * 2 / 3 / len(pieces))
+                yield self._response(piece, usage)
+
+        return chunks()
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "failures": self.failures}
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+POOL_CAPACITY = int(os.environ.get("POOL_CAPACITY", "20"))
+POOL_LOW_WATER = int(os.environ.get("POOL_LOW_WATER", "5"))
+POOL_BATCH_SIZE = int(os.environ.get("POOL_BATCH_SIZE", "5"))
+POOL_REFILL_INTERVAL_SECONDS = float(os.environ.get("POOL_REFILL_INTERVAL_SECONDS", "60"))
+POOL_RETRY_SECONDS = float(os.environ.get("POOL_RETRY_SECONDS", "5"))
+
+MOOD_BUCKETS = ("positive", "neutral", "negative")
+POSITIVE_MOODS = {"happy", "calm", "excited", "grateful", "content", "hopeful", "relaxed"}
+NEGATIVE_MOODS = {"sad", "anxious", "angry", "tired", "stressed", "lonely", "overwhelmed"}
+
+
+def mood_bucket(mood: Optional[str]) -> str:
+    if not mood:
+        return "neutral"
+    mood = mood.lower()
+    if mood in POSITIVE_MOODS:
+        return "positive"
+    if mood in NEGATIVE_MOODS:
+        return "negative"
+    return "neutral"
+
+
+class ContentPool:
+    """Bounded per-mood-bucket pools of ready-made LLM content.
+
+    `take` only ever reads from memory. `run` is the background refill loop:
+    whenever a bucket drops below the low-water mark it asks `generate_batch`
+    for several items per LLM call until the bucket is back at capacity.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        generate_batch: Callable[[str, int], Awaitable[list]],
+        capacity: int = POOL_CAPACITY,
+        low_water: int = POOL_LOW_WATER,
+        batch_size: int = POOL_BATCH_SIZE,
+        refill_interval: float = POOL_REFILL_INTERVAL_SECONDS,
+    ):
+        self.name = name
+        self.generate_batch = generate_batch
+        self.capacity = capacity
+        self.low_water = low_water
+        self.batch_size = batch_size
+        self.refill_interval = refill_interval
+        self._pools = {bucket: deque(maxlen=capacity) for bucket in MOOD_BUCKETS}
+        self._wakeup = asyncio.Event()
+
+        self.served = 0
+        self.empty = 0
+        self.generated = 0
+        self.refill_calls = 0
+        self.refill_failures = 0
+
+    def take(self, bucket: str):
+        pool = self._pools[bucket]
+        item = pool.popleft() if pool else None
+        if item is None:
+            self.empty += 1
+        else:
+            self.served += 1
+        if len(pool) < self.low_water:
+            self._wakeup.set()
+        return item
+
+    async def refill(self) -> bool:
+        ok = True
+        for bucket, pool in self._pools.items():
+            if len(pool) >= self.low_water:
+                continue
+            # Below low water: top the bucket up to capacity, a batch per call
+            while len(pool) < self.capacity:
+                count = min(self.batch_size, self.capacity - len(pool))
+                self.refill_calls += 1
+                try:
+                    items = await self.generate_batch(bucket, count)
+                except Exception as e:
+                    self.refill_failures += 1
+                    logger.warning("❌ Failed to refill %s pool (%s): %s", self.name, bucket, e)
+                    ok = False
+                    break
+                if not items:
+                    self.refill_failures += 1
+                    ok = False
+                    break
+                pool.extend(items[:count])
+                self.generated += len(items[:count])
+        return ok
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            if not await self.refill():
+                # Don't let a failing model turn every empty `take` into a retry storm
+                await asyncio.sleep(POOL_RETRY_SECONDS)
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "sizes": {bucket: len(pool) for bucket, pool in self._pools.items()},
+            "capacity": self.capacity,
+            "low_water": self.low_water,
+            "served": self.served,
+            "empty": self.empty,
+            "generated": self.generated,
+            "refill_calls": self.refill_calls,
+            "refill_failures": self.refill_failures,
+        }
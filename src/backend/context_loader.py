@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_DEADLINE_SECONDS = float(os.environ.get("CONTEXT_DEADLINE_SECONDS", "3"))
+
+
+@dataclass
+class UserContext:
+    moods: list = field(default_factory=list)
+    journals: list = field(default_factory=list)
+    insights: list = field(default_factory=list)
+    # Sources that failed or missed the deadline and came back empty
+    missing: List[str] = field(default_factory=list)
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+
+
+class ContextLoader:
+    """Fetches the per-user datasets agents need, concurrently.
+
+    All sources share one deadline; a source that fails or is still running
+    when it expires is left empty and listed in `missing` instead of failing
+    the whole load.
+    """
+
+    def __init__(self, db_accessor, deadline: float = CONTEXT_DEADLINE_SECONDS):
+        self.db_accessor = db_accessor
+        self.deadline = deadline
+        self.sources = {
+            "moods": lambda user_id: self.db_accessor.get_user_moods(user_id),
+            "journals": lambda user_id: self.db_accessor.get_user_journal_entries(user_id),
+            "insights": lambda user_id: self.db_accessor.get_user_insights(user_id),
+        }
+
+        # Per-source counters: loads, failures, timeouts, total time
+        self.source_stats = {name: {"loads": 0, "failures": 0, "timeouts": 0, "total_ms": 0.0} for name in self.sources}
+
+    async def load(self, user_id: str, sources=("moods", "journals"), deadline: Optional[float] = None) -> UserContext:
+        context = UserContext()
+
+        async def timed(name):
+            started = time.perf_counter()
+            try:
+                return await self.sources[name](user_id)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                context.timings_ms[name] = round(elapsed, 1)
+                self.source_stats[name]["total_ms"] += elapsed
+
+        tasks = {name: asyncio.ensure_future(timed(name)) for name in sources}
+        done, pending = await asyncio.wait(tasks.values(), timeout=deadline or self.deadline)
+
+        for task in pending:
+            task.cancel()
+
+        for name, task in tasks.items():
+            stats = self.source_stats[name]
+            stats["loads"] += 1
+            if task in pending:
+                stats["timeouts"] += 1
+                context.missing.append(name)
+            elif task.exception() is not None:
+                stats["failures"] += 1
+                context.missing.append(name)
+                logger.warning("❌ Failed to load %s for context: %s", name, task.exception())
+            else:
+                setattr(context, name, task.result())
+
+        return context
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "loads": s["loads"],
+                "failures": s["failures"],
+                "timeouts": s["timeouts"],
+                "avg_ms": round(s["total_ms"] / s["loads"], 1) if s["loads"] else 0.0,
+            }
+            for name, s in self.source_stats.items()
+        }
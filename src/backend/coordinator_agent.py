@@ -7,41 +7,209 @@ from agents.garden_agent import GardenVisualizerAgent
 from agents.cognitive_agent import CognitiveAgent
 
 from agents.affirmation_agent import AffirmationAgent
+from response_cache import ResponseCache
+from content_pool import ContentPool, mood_bucket
+from context_loader import ContextLoader
+from vector_index import JournalRetriever
+from insight_materializer import COGNITIVE_SUPPORT, MOOD_FREQUENCY, MOOD_TREND, InsightMaterializer, generated_at
+from models.classes import CognitiveSupportResponse
+from state_store import create_state_store
+import asyncio
+import logging
+from functools import cached_property
+
+logger = logging.getLogger(__name__)
+
+# Affirmation context until user profiles are wired in
+USER_INFO = "I am really motivating person who likes to build suff"
+DEFAULT_USER_MOOD = "happy"
+LATEST_JOURNALS = ["I am to build a new AI Application", "I was sad not to get the first position in the hackathon"]
 
 class CoordinatorAgent:
-  def __init__(self, model, db_accessor):
-    self.journal = JournalAgent(model)
-    self.mood = MoodAgent()
-    self.insight = InsightAgent()
-    self.wellness = WellnessCoachAgent()
-    self.goal = GoalAgent()
-    self.garden = GardenVisualizerAgent()
-    self.affirmation = AffirmationAgent(model)
-    self.cognitiveSupport = CognitiveAgent(model, db_accessor)
-
-  def get_journal_prompts(self):
-    return self.journal.generate_journal_prompts()
-
-  async def get_cognitive_support(self, user_id: str):
-    print("HI WE MADE IT")
-    print(user_id)
-    return await self.cognitiveSupport.get_cognitive_support(user_id)
-
-  def log_mood(self, mood):
-    self.mood.log_mood(mood)
-
-  def get_insights(self):
-    return self.insight.generate_insight(self.mood.get_moods())
-
-  def get_wellness_tip(self):
-    return self.wellness.suggest_tip()
-
-  def get_goal(self):
-    return self.goal.suggest_goal()
-
-  def get_garden_status(self):
-    entries = len(self.mood.get_moods())
-    return self.garden.get_growth_message(entries)
-
-  def get_affirmations(self):
-    return self.affirmation.generate_motivational_affirmations(user_info="I am really motivating person who likes to build suff",user_mood="happy",latest_journals=["I am to build a new AI Application", "I was sad not to get the first position in the hackathon"])
+  """Routes requests to the agents. Each agent (and the state store) is built
+  on first use, so a worker can start serving before all of them exist; the
+  pool and insight loops likewise start with the first request that needs
+  them (or with warm-up), not with the worker."""
+
+  AGENTS = (
+    "state", "journal", "mood", "insight", "wellness", "goal", "garden", "affirmation",
+    "context", "retriever", "cognitiveSupport", "materializer", "cache", "prompt_pool", "affirmation_pool",
+  )
+
+  def __init__(self, llm, db_accessor):
+    self.llm = llm
+    self.db_accessor = db_accessor
+    self._loops = {}
+
+  def warm_up(self):
+    """Build every agent and start the background loops now instead of on first use."""
+    for name in self.AGENTS:
+      getattr(self, name)
+    self.start_pools()
+    self.start_insights()
+
+  @cached_property
+  def state(self):
+    return create_state_store()  # Per-user, bounded; STATE_BACKEND=sqlite shares it across workers
+
+  @cached_property
+  def journal(self):
+    return JournalAgent(self.llm)
+
+  @cached_property
+  def mood(self):
+    return MoodAgent(self.state)
+
+  @cached_property
+  def insight(self):
+    return InsightAgent(self.state)
+
+  @cached_property
+  def wellness(self):
+    return WellnessCoachAgent(self.state)
+
+  @cached_property
+  def goal(self):
+    return GoalAgent(self.state)
+
+  @cached_property
+  def garden(self):
+    return GardenVisualizerAgent()
+
+  @cached_property
+  def affirmation(self):
+    return AffirmationAgent(self.llm)
+
+  @cached_property
+  def context(self):
+    return ContextLoader(self.db_accessor)  # Shared by agents that need user history
+
+  @cached_property
+  def retriever(self):
+    return JournalRetriever(self.db_accessor)  # Bounds how much journal text reaches the prompt
+
+  @cached_property
+  def cognitiveSupport(self):
+    return CognitiveAgent(self.llm, self.context, self.retriever)
+
+  @cached_property
+  def materializer(self):
+    return InsightMaterializer(self.db_accessor, self.mood, self.insight, self.cognitiveSupport)
+
+  @cached_property
+  def cache(self):
+    return ResponseCache()
+
+  @cached_property
+  def prompt_pool(self):
+    return ContentPool("journal-prompt", self.journal.generate_journal_prompt_sets)
+
+  @cached_property
+  def affirmation_pool(self):
+    return ContentPool(
+      "affirmation",
+      lambda bucket, count: self.affirmation.generate_affirmation_batch(USER_INFO, bucket, LATEST_JOURNALS, count),
+    )
+
+  def _start_loop(self, name: str, run):
+    # Must be called from the event loop; later calls are no-ops
+    if name not in self._loops:
+      self._loops[name] = asyncio.get_running_loop().create_task(run())
+
+  def start_pools(self):
+    self._start_loop("pools", self.run_pools)
+
+  def start_insights(self):
+    self._start_loop("insights", self.run_insights)
+
+  def stop(self):
+    for task in self._loops.values():
+      task.cancel()
+
+  async def run_pools(self):
+    await asyncio.gather(self.prompt_pool.run(), self.affirmation_pool.run())
+
+  async def run_insights(self):
+    await self.materializer.run()
+
+  def on_moods(self, moods):
+    # Insights are precomputed for users with new data, not per request
+    self.materializer.on_moods(moods)
+    self.start_insights()
+
+  def on_journal_entries(self, entries):
+    # Entries are embedded once, at write time, for cognitive-support retrieval
+    self.retriever.on_journal_entries(entries)
+    self.materializer.on_journal_entries(entries)
+    self.start_insights()
+
+  async def get_journal_prompts(self, mood: str = None):
+    self.start_pools()  # Keep the pools topped up from now on
+    prompts = self.prompt_pool.take(mood_bucket(mood))
+    if prompts:
+      return prompts
+
+    key = self.cache.make_key("journal", self.journal.build_prompt())
+    # Don't cache the static fallback served for a failed/unparseable response
+    return await self.cache.get_or_compute(
+      key, self.journal.generate_journal_prompts,
+      cacheable=lambda prompts: bool(prompts) and prompts is not JournalAgent.FALLBACK_PROMPTS,
+    )
+
+  async def get_cognitive_support(self, user_id: str, fresh: bool = False):
+    if not fresh:
+      # Serve the last materialized summary; it is refreshed in the background
+      support = (await self.materializer.latest(user_id)).get(COGNITIVE_SUPPORT)
+      if support:
+        return CognitiveSupportResponse(**support.data, generated_at=support.created_at)
+    try:
+      return await self.cognitiveSupport.get_cognitive_support(user_id)
+    except Exception as e:
+      logger.warning("❌ Cognitive support failed, serving fallback: %s", e)
+      return CognitiveAgent.FALLBACK_RESPONSE
+
+  async def stream_cognitive_support(self, user_id: str):
+    streamed = False
+    try:
+      async for event in self.cognitiveSupport.stream_cognitive_support(user_id):
+        streamed = True
+        yield event
+    except Exception as e:
+      if streamed:
+        raise
+      logger.warning("❌ Cognitive support stream failed, serving fallback: %s", e)
+      yield ("done", None, CognitiveAgent.FALLBACK_RESPONSE)
+
+  def stream_journal_reflection(self, entry: str):
+    return self.journal.stream_reflection(entry)
+
+  def log_mood(self, user_id: str, mood: str):
+    self.mood.log_mood(user_id, mood)
+
+  async def get_insights(self, user_id: str):
+    latest = await self.materializer.latest(user_id)
+    insights = [latest[t] for t in (MOOD_FREQUENCY, MOOD_TREND) if t in latest]
+    return {"insights": [i.content for i in insights], "generated_at": generated_at(insights)}
+
+  def get_wellness_tip(self, user_id: str):
+    return self.wellness.suggest_wellness_tip(user_id)
+
+  def get_goal(self, user_id: str):
+    return self.goal.suggest_goal(user_id)
+
+  def get_garden_status(self, user_id: str):
+    return self.garden.get_growth_message(self.mood.mood_count(user_id))
+
+  async def get_affirmations(self, mood: str = None):
+    self.start_pools()
+    quote = self.affirmation_pool.take(mood_bucket(mood))
+    if quote:
+      return quote
+
+    user_mood = mood or DEFAULT_USER_MOOD
+    key = self.cache.make_key("affirmation", self.affirmation.build_prompt(USER_INFO, user_mood, LATEST_JOURNALS))
+    return await self.cache.get_or_compute(
+      key,
+      lambda: self.affirmation.generate_motivational_affirmations(user_info=USER_INFO, user_mood=user_mood, latest_journals=LATEST_JOURNALS),
+      cacheable=lambda quote: quote != AffirmationAgent.FALLBACK_AFFIRMATION,
+    )
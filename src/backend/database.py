@@ -1,113 +1,425 @@
+import asyncio
+import functools
+import logging
 import os
-from supabase import create_client, Client
+import time
+import httpx
 from dotenv import load_dotenv
-from typing import List, Optional
-from models.schemas import MoodInput, MoodResponse, JournalEntryInput, JournalEntryResponse, InsightResponse, MoodTrendPoint, MoodTrendResponse
-from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from models.schemas import MoodInput, MoodResponse, JournalEntryInput, JournalEntryResponse, InsightResponse, MoodTrendPoint, MoodTrendResponse, MoodAnalyticsResponse, MoodBatchItem, JournalEntryBatchItem, BatchItemResult
+from datetime import date, datetime, timedelta, timezone
+from metrics import DB_REQUEST_SECONDS
+from mood_rollups import MoodRollupCache
+from mood_analytics import aggregate_moods, to_datetime64
+import numpy as np
+from pagination import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Connection pool / concurrency knobs for the PostgREST client
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "20"))
+DB_MAX_CONCURRENCY = int(os.environ.get("DB_MAX_CONCURRENCY", "20"))
+DB_TIMEOUT_SECONDS = float(os.environ.get("DB_TIMEOUT_SECONDS", "10"))
+DB_PAGE_SIZE = int(os.environ.get("DB_PAGE_SIZE", "1000"))
+# Upper bound on concurrent time-slice reads for a long analytics window
+ANALYTICS_MAX_SLICES = int(os.environ.get("ANALYTICS_MAX_SLICES", "8"))
+
+
 class Database:
-    def __init__(self):
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_KEY")
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        url = url or os.environ.get("SUPABASE_URL")
+        key = key or os.environ.get("SUPABASE_KEY")
         if not url or not key:
             raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
-        self.supabase: Client = create_client(url, key)
-    
+
+        self.url = url
+        self._key = key
+        self._transport = transport
+        self.timeout = DB_TIMEOUT_SECONDS
+        self._semaphore = asyncio.Semaphore(DB_MAX_CONCURRENCY)
+        self.rollups = MoodRollupCache()
+        # Called with newly stored JournalEntryResponse / MoodResponse lists; must not block
+        self.journal_entry_hooks = []
+        self.mood_hooks = []
+
+    @functools.cached_property
+    def client(self) -> httpx.AsyncClient:
+        # Talk to Supabase's PostgREST API directly over a pooled, keep-alive
+        # async client so a DB round trip never blocks the event loop. Built on
+        # first use: its TLS context is a noticeable part of worker start-up.
+        return httpx.AsyncClient(
+            base_url=f"{self.url.rstrip('/')}/rest/v1",
+            headers={"apikey": self._key, "Authorization": f"Bearer {self._key}"},
+            limits=httpx.Limits(
+                max_connections=DB_POOL_SIZE,
+                max_keepalive_connections=DB_POOL_SIZE,
+                keepalive_expiry=30,
+            ),
+            timeout=httpx.Timeout(DB_TIMEOUT_SECONDS),
+            transport=self._transport,
+        )
+
+    async def warm_up(self):
+        """Create the client and open a pooled connection with a one-row read."""
+        await self._select("users", [], columns="id", limit=1)
+
+    async def close(self):
+        if "client" in self.__dict__:
+            await self.client.aclose()
+
+    async def _request(self, method: str, path: str, params: Optional[list] = None, json=None, prefer: Optional[str] = None):
+        headers = {"Prefer": prefer} if prefer else None
+
+        async def send():
+            async with self._semaphore:
+                response = await self.client.request(method, f"/{path}", params=params, json=json, headers=headers)
+            response.raise_for_status()
+            return response.json() if response.content else []
+
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            # The deadline covers waiting for a free slot as well as the request itself
+            result = await asyncio.wait_for(send(), timeout=self.timeout)
+            outcome = "ok"
+            return result
+        finally:
+            DB_REQUEST_SECONDS.observe(time.perf_counter() - started, (f"{method} {path}", outcome))
+
+    async def _select(self, table: str, filters: list, columns: str = "*", order: Optional[str] = None, limit: Optional[int] = None) -> list:
+        params = [("select", columns), *filters]
+        if order:
+            params.append(("order", order))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+        return await self._request("GET", table, params=params)
+
+    async def _select_pages(self, table: str, filters: list, columns: str = "*", page_size: int = DB_PAGE_SIZE):
+        """Yield pages of rows in (created_at, id) order using keyset pagination."""
+        columns = columns if columns == "*" else f"{columns},id,created_at"
+        last = None
+        while True:
+            page_filters = list(filters)
+            if last is not None:
+                page_filters.append(("or", f'(created_at.gt."{last["created_at"]}",and(created_at.eq."{last["created_at"]}",id.gt.{last["id"]}))'))
+            rows = await self._select(table, page_filters, columns=columns, order="created_at.asc,id.asc", limit=page_size)
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return
+            last = rows[-1]
+
+    async def _select_page(self, table: str, filters: list, limit: int, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Tuple[list, Optional[str]]:
+        """One page in (created_at, id) descending order, plus the cursor for the next page."""
+        limit = max(limit, 1)
+        columns = ",".join(dict.fromkeys([*fields, "id", "created_at"])) if fields else "*"
+        page_filters = list(filters)
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            page_filters.append(("or", f'(created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id}))'))
+
+        # Fetch one extra row to know whether there is a next page
+        rows = await self._select(table, page_filters, columns=columns, order="created_at.desc,id.desc", limit=limit + 1)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, encode_cursor(rows[-1])
+        return rows, None
+
+    async def _insert(self, table: str, rows) -> list:
+        return await self._request("POST", table, json=rows, prefer="return=representation")
+
+    async def _insert_batch(self, table: str, user_id: str, rows: List[dict]) -> Tuple[List[BatchItemResult], list]:
+        """Multi-row insert deduplicated on (user_id, idempotency_key).
+
+        Returns a result per input row, in order, and the rows that were newly created.
+        """
+        unique = {}
+        for row in rows:
+            unique.setdefault(row["idempotency_key"], row)
+
+        created = await self._request(
+            "POST", table,
+            params=[("on_conflict", "user_id,idempotency_key")],
+            json=list(unique.values()),
+            prefer="return=representation,resolution=ignore-duplicates",
+        ) if unique else []
+        stored = {row["idempotency_key"]: row for row in created}
+
+        # Keys that were already stored by an earlier sync: look up their ids
+        missing = [key for key in unique if key not in stored]
+        if missing:
+            keys = ",".join('"' + key.replace('\\', '\\\\').replace('"', '\\"') + '"' for key in missing)
+            existing = await self._select(table, [("user_id", f"eq.{user_id}"), ("idempotency_key", f"in.({keys})")], columns="id,idempotency_key,created_at")
+            for row in existing:
+                stored.setdefault(row["idempotency_key"], {**row, "duplicate": True})
+
+        results = []
+        seen = set()
+        for row in rows:
+            key = row["idempotency_key"]
+            match = stored.get(key, {})
+            duplicate = key in seen or match.get("duplicate", False)
+            seen.add(key)
+            results.append(BatchItemResult(
+                idempotency_key=key,
+                status="duplicate" if duplicate else "created",
+                id=match.get("id"),
+                created_at=match.get("created_at"),
+            ))
+        return results, created
+
+    async def _rpc(self, function: str, args: dict):
+        return await self._request("POST", f"rpc/{function}", json=args)
+
+    async def create_user(self, user_id: str, email: str, username: Optional[str] = None) -> dict:
+        data = await self._insert("users", {
+            "id": user_id,
+            "email": email,
+            "username": username
+        })
+
+        if data:
+            return data[0]
+        raise Exception("Failed to create user")
+
     async def create_mood(self, user_id: str, mood_data: MoodInput) -> MoodResponse:
-        response = self.supabase.table("moods").insert({
+        data = await self._insert("moods", {
             "user_id": user_id,
             "mood_value": mood_data.mood_value,
             "mood_score": mood_data.mood_score,
             "notes": mood_data.notes
-        }).execute()
-        
-        if response.data:
-            mood = response.data[0]
-            return MoodResponse(**mood)
+        })
+
+        if data:
+            mood = data[0]
+            self._drop_cached_rollups([mood])
+            response = MoodResponse(**mood)
+            self._notify_moods([response])
+            return response
         raise Exception("Failed to create mood")
-    
+
+    async def create_moods_batch(self, user_id: str, items: List[MoodBatchItem]) -> Tuple[List[BatchItemResult], List[MoodResponse]]:
+        now = datetime.now(timezone.utc)
+        results, created = await self._insert_batch("moods", user_id, [
+            {
+                "user_id": user_id,
+                "mood_value": item.mood_value,
+                "mood_score": item.mood_score,
+                "notes": item.notes,
+                "idempotency_key": item.idempotency_key,
+                "created_at": (item.created_at or now).isoformat(),
+            }
+            for item in items
+        ])
+
+        moods = [MoodResponse(**mood) for mood in created]
+        if created:
+            self._drop_cached_rollups(created)
+            self._notify_moods(moods)
+        return results, moods
+
+    async def write_mood_rows(self, rows: List[dict]) -> List[MoodResponse]:
+        """Insert fully-formed mood rows (ids assigned by the caller); rows already stored are skipped."""
+        created = await self._request(
+            "POST", "moods",
+            params=[("on_conflict", "id")],
+            json=rows,
+            prefer="return=representation,resolution=ignore-duplicates",
+        )
+
+        moods = [MoodResponse(**mood) for mood in created]
+        if created:
+            self._drop_cached_rollups(created)
+            self._notify_moods(moods)
+        return moods
+
+    def _drop_cached_rollups(self, moods: List[dict]):
+        """Forget cached trends for users whose check-ins were just stored.
+
+        The rollups themselves are kept by the `moods_daily_rollup` trigger in the
+        inserting transaction; this runs after the write so a trend read racing
+        it can't re-cache the old rows.
+        """
+        for user_id in {mood["user_id"] for mood in moods}:
+            self.rollups.invalidate(user_id)
+
+    def _notify_moods(self, moods: List[MoodResponse]):
+        for hook in self.mood_hooks:
+            try:
+                hook(moods)
+            except Exception as e:
+                logger.error("❌ Mood hook failed: %s", e)
+
+    async def get_user_moods_page(self, user_id: str, limit: int = 30, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Tuple[list, Optional[str]]:
+        return await self._select_page("moods", [("user_id", f"eq.{user_id}")], limit, cursor, fields)
+
     async def get_user_moods(self, user_id: str, limit: int = 7) -> List[MoodResponse]:
-        response = self.supabase.table("moods").select("*").eq("user_id", user_id).order("created_at", desc=True).limit(limit).execute()
-        
-        return [MoodResponse(**mood) for mood in response.data]
-    
+        data = await self._select("moods", [("user_id", f"eq.{user_id}")], order="created_at.desc", limit=limit)
+
+        return [MoodResponse(**mood) for mood in data]
+
     async def create_journal_entry(self, user_id: str, entry_data: JournalEntryInput) -> JournalEntryResponse:
-        response = self.supabase.table("journal_entries").insert({
+        data = await self._insert("journal_entries", {
             "user_id": user_id,
             "title": entry_data.title,
             "content": entry_data.content
-        }).execute()
-        
-        if response.data:
-            entry = response.data[0]
-            return JournalEntryResponse(**entry)
+        })
+
+        if data:
+            entry = JournalEntryResponse(**data[0])
+            self._notify_journal_entries([entry])
+            return entry
         raise Exception("Failed to create journal entry")
-    
+
+    def _notify_journal_entries(self, entries: List[JournalEntryResponse]):
+        for hook in self.journal_entry_hooks:
+            try:
+                hook(entries)
+            except Exception as e:
+                logger.error("❌ Journal entry hook failed: %s", e)
+
+    async def update_sentiment_scores(self, scores: List[dict]):
+        """Bulk write-back of [{"id": ..., "score": ...}] in one round trip."""
+        await self._rpc("set_sentiment_scores", {"p_scores": scores})
+
+    async def create_journal_entries_batch(self, user_id: str, items: List[JournalEntryBatchItem]) -> Tuple[List[BatchItemResult], List[JournalEntryResponse]]:
+        now = datetime.now(timezone.utc)
+        results, created = await self._insert_batch("journal_entries", user_id, [
+            {
+                "user_id": user_id,
+                "title": item.title,
+                "content": item.content,
+                "idempotency_key": item.idempotency_key,
+                "created_at": (item.created_at or now).isoformat(),
+            }
+            for item in items
+        ])
+
+        entries = [JournalEntryResponse(**entry) for entry in created]
+        if entries:
+            self._notify_journal_entries(entries)
+        return results, entries
+
+    async def get_user_journal_entries_page(self, user_id: str, limit: int = 20, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Tuple[list, Optional[str]]:
+        return await self._select_page("journal_entries", [("user_id", f"eq.{user_id}")], limit, cursor, fields)
+
+    async def iter_user_journal_entries(self, user_id: str, inserted_since: Optional[str] = None):
+        """Yield pages of a user's journal rows, oldest first, optionally only those
+        stored (`inserted_at`, not the client-settable `created_at`) from `inserted_since` on."""
+        filters = [("user_id", f"eq.{user_id}")]
+        if inserted_since:
+            filters.append(("inserted_at", f"gte.{inserted_since}"))
+        async for rows in self._select_pages("journal_entries", filters, columns="title,content,inserted_at"):
+            yield rows
+
+    async def iter_unscored_journal_entries(self):
+        """Yield pages of journal rows (all users) whose sentiment score is still NULL, oldest first."""
+        async for rows in self._select_pages("journal_entries", [("sentiment_score", "is.null")], columns="content"):
+            yield rows
+
+    async def iter_user_rows(self, table: str, user_id: str, page_size: int = DB_PAGE_SIZE):
+        """Yield pages of all of a user's rows in `table`, oldest first, as plain dicts."""
+        async for rows in self._select_pages(table, [("user_id", f"eq.{user_id}")], page_size=page_size):
+            yield rows
+
     async def get_user_journal_entries(self, user_id: str, limit: int = 7) -> List[JournalEntryResponse]:
-        response = self.supabase.table("journal_entries").select("*").eq("user_id", user_id).order("created_at", desc=True).limit(limit).execute()
-        
-        return [JournalEntryResponse(**entry) for entry in response.data]
-    
+        data = await self._select("journal_entries", [("user_id", f"eq.{user_id}")], order="created_at.desc", limit=limit)
+
+        return [JournalEntryResponse(**entry) for entry in data]
+
     async def create_insight(self, user_id: str, insight_type: str, content: str, data: Optional[dict] = None) -> InsightResponse:
-        response = self.supabase.table("insights").insert({
+        rows = await self._insert("insights", {
             "user_id": user_id,
             "insight_type": insight_type,
             "content": content,
             "data": data
-        }).execute()
-        
-        if response.data:
-            insight = response.data[0]
+        })
+
+        if rows:
+            insight = rows[0]
             return InsightResponse(**insight)
         raise Exception("Failed to create insight")
-    
+
+    async def get_user_insights_page(self, user_id: str, insight_type: Optional[str] = None, limit: int = 10, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Tuple[list, Optional[str]]:
+        filters = [("user_id", f"eq.{user_id}")]
+        if insight_type:
+            filters.append(("insight_type", f"eq.{insight_type}"))
+        return await self._select_page("insights", filters, limit, cursor, fields)
+
     async def get_user_insights(self, user_id: str, insight_type: Optional[str] = None, limit: int = 10) -> List[InsightResponse]:
-        query = self.supabase.table("insights").select("*").eq("user_id", user_id)
-        
+        filters = [("user_id", f"eq.{user_id}")]
+
         if insight_type:
-            query = query.eq("insight_type", insight_type)
-        
-        response = query.order("created_at", desc=True).limit(limit).execute()
-        
-        return [InsightResponse(**insight) for insight in response.data]
-    
+            filters.append(("insight_type", f"eq.{insight_type}"))
+
+        data = await self._select("insights", filters, order="created_at.desc", limit=limit)
+
+        return [InsightResponse(**insight) for insight in data]
+
     async def get_weekly_mood_trend(self, user_id: str) -> MoodTrendResponse:
         # Get date 7 days ago
         seven_days_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-        
-        # Query moods from last 7 days
-        response = self.supabase.table("moods").select("mood_score, created_at").eq("user_id", user_id).gte("created_at", seven_days_ago).execute()
-        
-        # Group by date and calculate averages
-        daily_data = {}
-        for mood in response.data:
-            # Extract date part from timestamp
-            mood_date = datetime.fromisoformat(mood['created_at'].replace('Z', '+00:00')).date()
-            
-            if mood_date not in daily_data:
-                daily_data[mood_date] = {'scores': [], 'count': 0}
-            
-            daily_data[mood_date]['scores'].append(mood['mood_score'])
-            daily_data[mood_date]['count'] += 1
-        
-        # Create trend points
-        trend_points = []
-        for date_key, data in daily_data.items():
-            average_score = sum(data['scores']) / len(data['scores'])
-            trend_points.append(MoodTrendPoint(
-                date=date_key,
-                average_score=round(average_score, 2),
-                count=data['count']
-            ))
-        
-        # Sort by date
-        trend_points.sort(key=lambda x: x.date)
-        
+
+        # Answer from the daily rollups: one row per day regardless of check-in volume
+        rows = self.rollups.get(user_id, seven_days_ago)
+        if rows is None:
+            rows = await self._select(
+                "mood_daily_rollups",
+                [("user_id", f"eq.{user_id}"), ("day", f"gte.{seven_days_ago}")],
+                columns="day,score_sum,score_count",
+                order="day.asc",
+            )
+            self.rollups.put(user_id, seven_days_ago, rows)
+
+        trend_points = [
+            MoodTrendPoint(
+                date=date.fromisoformat(row['day']),
+                average_score=round(row['score_sum'] / row['score_count'], 2),
+                count=row['score_count']
+            )
+            for row in rows
+            if row['score_count']
+        ]
+
         return MoodTrendResponse(trend=trend_points)
 
+    async def get_mood_analytics(self, user_id: str, start: datetime, end: datetime, granularity: str = "day", window: int = 7) -> MoodAnalyticsResponse:
+        def window_filters(lo: datetime, hi: datetime) -> list:
+            return [("user_id", f"eq.{user_id}"), ("created_at", f"gte.{lo.isoformat()}"), ("created_at", f"lt.{hi.isoformat()}")]
+
+        columns = "mood_score,id,created_at"
+        first = await self._select("moods", window_filters(start, end), columns=columns, order="created_at.asc,id.asc", limit=DB_PAGE_SIZE)
+        pages = [first]
+        if len(first) == DB_PAGE_SIZE:
+            # More than a page: rather than paging through a year one round trip
+            # after another, split the rest of the window into time slices sized
+            # from the first page's density and read them concurrently
+            last = first[-1]["created_at"]
+            resume = datetime.fromisoformat(last.replace('Z', '+00:00'))
+            seen = {row["id"] for row in first if row["created_at"] == last}
+            covered = (resume - start).total_seconds()
+            expected_pages = (end - resume).total_seconds() / covered if covered > 0 else ANALYTICS_MAX_SLICES
+            slices = max(1, min(ANALYTICS_MAX_SLICES, int(np.ceil(expected_pages))))
+            bounds = [resume + (end - resume) * i / slices for i in range(slices)] + [end]
+
+            async def read_slice(lo: datetime, hi: datetime) -> list:
+                rows = []
+                async for page in self._select_pages("moods", window_filters(lo, hi), columns="mood_score"):
+                    rows.extend(page)
+                return rows
+
+            for rows in await asyncio.gather(*(read_slice(lo, hi) for lo, hi in zip(bounds, bounds[1:]))):
+                pages.append([row for row in rows if row["id"] not in seen])
+
+        scores = [row['mood_score'] for rows in pages for row in rows]
+        timestamps = [row['created_at'] for rows in pages for row in rows]
+        trend = aggregate_moods(np.array(scores), to_datetime64(timestamps), granularity, window) if scores else []
+
+        return MoodAnalyticsResponse(granularity=granularity, start=start, end=end, window=window, trend=trend)
 
 
 # Global database instance
-db = Database()
\ No newline at end of file
+db = Database()
@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+EXPORT_PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", "500"))
+EXPORT_GZIP_LEVEL = int(os.environ.get("EXPORT_GZIP_LEVEL", "6"))
+
+# Export record type -> table
+EXPORT_TABLES: Dict[str, str] = {
+    "mood": "moods",
+    "journal_entry": "journal_entries",
+    "insight": "insights",
+}
+
+
+def ndjson_line(record: dict) -> str:
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+
+
+async def export_ndjson(db, user_id: str, types: Iterable[str], page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[bytes]:
+    """Yield a user's history as NDJSON, one chunk per database page.
+
+    Rows are read with keyset pagination and serialized as they arrive, so at
+    most one page is held in memory. The first line describes the export and
+    the last one carries per-type counts, so a consumer can tell a complete
+    export from one cut short; a failure mid-stream is reported as an
+    `error` line, since the status code has already been sent.
+    """
+    types = list(types)
+    yield ndjson_line({
+        "type": "export",
+        "user_id": user_id,
+        "types": types,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }).encode()
+
+    counts = {}
+    try:
+        for record_type in types:
+            counts[record_type] = 0
+            async for rows in db.iter_user_rows(EXPORT_TABLES[record_type], user_id, page_size):
+                yield "".join(ndjson_line({"type": record_type, **row}) for row in rows).encode()
+                counts[record_type] += len(rows)
+    except Exception as e:
+        logger.error("❌ Export for %s failed: %s", user_id, e)
+        yield ndjson_line({"type": "error", "detail": str(e), "counts": counts}).encode()
+        return
+
+    yield ndjson_line({"type": "end", "counts": counts}).encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = EXPORT_GZIP_LEVEL) -> AsyncIterator[bytes]:
+    """Compress a byte stream into a single gzip member, chunk by chunk."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 16 + 15: gzip header and trailer
+    async for chunk in chunks:
+        # Sync-flush each page so the client keeps receiving data while we read
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INSIGHT_MATERIALIZE_SECONDS = float(os.environ.get("INSIGHT_MATERIALIZE_SECONDS", "300"))
+INSIGHT_MOOD_WINDOW = int(os.environ.get("INSIGHT_MOOD_WINDOW", "30"))
+# Other workers materialize too; re-read the newest rows after this long
+INSIGHT_LATEST_TTL_SECONDS = float(os.environ.get("INSIGHT_LATEST_TTL_SECONDS", "60"))
+
+MOOD_FREQUENCY = "mood_frequency"
+MOOD_TREND = "mood_trend"
+COGNITIVE_SUPPORT = "cognitive_support"
+MATERIALIZED_TYPES = (MOOD_FREQUENCY, MOOD_TREND, COGNITIVE_SUPPORT)
+
+
+class InsightMaterializer:
+    """Precomputes per-user insights into the `insights` table.
+
+    Mood and journal writes mark their user dirty; a background loop
+    recomputes insights for dirty users only, and only if their newest mood or
+    journal entry is later than the `source_watermark` stored with the last
+    materialized insight. Readers get the latest rows from memory, re-read from
+    the DB every `latest_ttl` seconds, instead of recomputing per request. A
+    user with no insights at all gets the cheap ones computed on the spot and
+    the LLM summary in the background.
+    """
+
+    def __init__(
+        self, db, mood_agent, insight_agent, cognitive_agent,
+        interval: float = INSIGHT_MATERIALIZE_SECONDS, latest_ttl: float = INSIGHT_LATEST_TTL_SECONDS,
+    ):
+        self.db = db
+        self.mood_agent = mood_agent
+        self.insight_agent = insight_agent
+        self.cognitive_agent = cognitive_agent
+        self.interval = interval
+        self.latest_ttl = latest_ttl
+        self._dirty = set()  # users with writes since their last run
+        self._latest: Dict[str, dict] = {}  # user_id -> {insight_type: InsightResponse}
+        self._read_at: Dict[str, float] = {}  # user_id -> when _latest was last read from the DB
+        self._running: Dict[str, asyncio.Task] = {}
+        self._tasks = set()
+
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+
+    def on_moods(self, moods):
+        self._dirty.update(mood.user_id for mood in moods)
+
+    def on_journal_entries(self, entries):
+        self._dirty.update(entry.user_id for entry in entries)
+
+    async def latest(self, user_id: str) -> dict:
+        """Newest materialized insight per type, materializing if there are none yet."""
+        latest = self._latest.get(user_id)
+        if latest is None or time.monotonic() - self._read_at[user_id] > self.latest_ttl:
+            rows = await self.db.get_user_insights(user_id, limit=10)
+            latest = {}
+            for insight in rows:  # newest first
+                if insight.insight_type in MATERIALIZED_TYPES:
+                    latest.setdefault(insight.insight_type, insight)
+            self._latest[user_id] = latest
+            self._read_at[user_id] = time.monotonic()
+        if not latest:
+            latest = await self.materialize(user_id, summarize=False)
+        return latest
+
+    async def materialize(self, user_id: str, summarize: bool = True) -> dict:
+        """Recompute a user's insights; with `summarize=False` the LLM summary is left to a background task."""
+        # One run per user at a time, whoever asked for it
+        task = self._running.get(user_id)
+        if task is None:
+            task = self._running[user_id] = asyncio.ensure_future(self._materialize(user_id, summarize))
+            task.add_done_callback(lambda _: self._running.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    async def _materialize(self, user_id: str, summarize: bool) -> dict:
+        latest = self._latest.setdefault(user_id, {})
+        self._read_at.setdefault(user_id, time.monotonic())
+        moods, journals = await asyncio.gather(
+            self.db.get_user_moods(user_id, limit=INSIGHT_MOOD_WINDOW),
+            self.db.get_user_journal_entries(user_id, limit=1),
+        )
+        if not moods and not journals:
+            return latest
+        watermark = max([m.created_at.isoformat() for m in moods[:1]] + [j.created_at.isoformat() for j in journals])
+
+        previous = [i.data.get("source_watermark", "") for i in latest.values() if i.data]
+        if previous and len(latest) == len(MATERIALIZED_TYPES) and watermark <= min(previous):
+            self.skipped += 1
+            return latest
+
+        values = [m.mood_value for m in reversed(moods)]  # oldest first
+        counts = Counter(values)
+        writes = [
+            self.db.create_insight(user_id, MOOD_FREQUENCY, self.insight_agent.get_insight(values), {
+                "source_watermark": watermark,
+                "counts": dict(counts),
+            }),
+            self.db.create_insight(user_id, MOOD_TREND, self.mood_agent.analyze_mood(values), {
+                "source_watermark": watermark,
+                "negative_spiral": self.mood_agent.is_negative_spiral(values),
+            }),
+        ]
+        for insight in await asyncio.gather(*writes):
+            self._latest.setdefault(user_id, {})[insight.insight_type] = insight
+
+        if summarize:
+            await self._summarize(user_id, watermark)
+        else:
+            task = asyncio.ensure_future(self._summarize(user_id, watermark))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self.runs += 1
+        return self._latest[user_id]
+
+    async def _summarize(self, user_id: str, watermark: str):
+        # The LLM summary is the expensive part; on failure keep the previous
+        # one and let the next background run retry
+        try:
+            support = await self.cognitive_agent.get_cognitive_support(user_id)
+            insight = await self.db.create_insight(
+                user_id, COGNITIVE_SUPPORT, support.summary or support.coping_mechanism,
+                {"source_watermark": watermark, **support.model_dump(exclude={"generated_at"})},
+            )
+        except Exception as e:
+            self.failures += 1
+            self._dirty.add(user_id)
+            logger.warning("❌ Failed to summarize insights for %s: %s", user_id, e)
+            return
+        self._latest.setdefault(user_id, {})[COGNITIVE_SUPPORT] = insight
+
+    async def run_once(self) -> List[str]:
+        users, self._dirty = list(self._dirty), set()
+        for user_id in users:
+            try:
+                await self.materialize(user_id)
+            except Exception as e:
+                self.failures += 1
+                logger.error("❌ Failed to materialize insights for %s: %s", user_id, e)
+        return users
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    def stats(self) -> dict:
+        return {
+            "dirty_users": len(self._dirty),
+            "cached_users": len(self._latest),
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "failures": self.failures,
+        }
+
+
+def generated_at(insights: List) -> Optional[str]:
+    """Freshness of a set of materialized insights: when the oldest was written."""
+    return min(i.created_at for i in insights).isoformat() if insights else None
@@ -0,0 +1,178 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", "1000"))
+JOB_RESULT_TTL_SECONDS = float(os.environ.get("JOB_RESULT_TTL_SECONDS", "600"))
+JOB_MAX_WAIT_SECONDS = float(os.environ.get("JOB_MAX_WAIT_SECONDS", "30"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    user_id: str
+    priority: int
+    status: str = "queued"  # queued -> running -> succeeded | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: object = None
+    error: Optional[str] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobRunner:
+    """Bounded worker pool for long-running per-user work.
+
+    Jobs run in priority order (lower first, FIFO within a priority) on
+    `workers` tasks. Submitting a kind of job for a user who already has one
+    queued or running returns that job instead of starting another. Finished
+    jobs are kept for `result_ttl` seconds so clients can collect the result.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING, result_ttl: float = JOB_RESULT_TTL_SECONDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._handlers: Dict[str, Callable[[str], Awaitable]] = {}
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[tuple, Job] = {}  # (kind, user_id) -> queued or running job
+        self._tasks = []
+
+        self.running = 0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.max_run = 0.0
+
+    def register(self, kind: str, handler: Callable[[str], Awaitable]):
+        self._handlers[kind] = handler
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def submit(self, kind: str, user_id: str, priority: int = PRIORITY_INTERACTIVE) -> Job:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self._expire()
+
+        job = self._active.get((kind, user_id))
+        if job is not None:
+            self.deduplicated += 1
+            return job
+        if self._queue.qsize() >= self.max_pending:
+            self.rejected += 1
+            raise JobQueueFullError("Job queue is full, try again shortly")
+
+        job = Job(id=str(uuid.uuid4()), kind=kind, user_id=user_id, priority=priority)
+        self._jobs[job.id] = job
+        self._active[(kind, user_id)] = job
+        self._queue.put_nowait((priority, next(self._seq), job))
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Long-poll: return once the job finishes or `timeout` passes, whichever is first."""
+        timeout = min(timeout, JOB_MAX_WAIT_SECONDS)
+        if timeout > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            wait = job.started_at - job.created_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.running += 1
+            try:
+                job.result = await self._handlers[job.kind](job.user_id)
+                job.status = "succeeded"
+                self.succeeded += 1
+            except asyncio.CancelledError:
+                job.status, job.error = "failed", "cancelled"
+                raise
+            except Exception as e:
+                job.status, job.error = "failed", str(e) or type(e).__name__
+                self.failed += 1
+                logger.warning("❌ Job %s for %s failed: %s", job.kind, job.user_id, job.error)
+            finally:
+                self.running -= 1
+                job.finished_at = time.time()
+                run = job.finished_at - job.started_at
+                self.total_run += run
+                self.max_run = max(self.max_run, run)
+                self._active.pop((job.kind, job.user_id), None)
+                job.done.set()
+
+    def _expire(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        started = self.succeeded + self.failed + self.running
+        finished = self.succeeded + self.failed
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "running": self.running,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / started * 1000, 1) if started else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "avg_run_ms": round(self.total_run / finished * 1000, 1) if finished else 0.0,
+            "max_run_ms": round(self.max_run * 1000, 1),
+        }
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "llm_cache.db")  # "" disables the disk tier
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_MAX_DISK_MB = float(os.environ.get("LLM_CACHE_MAX_DISK_MB", "64"))
+# Per-namespace TTLs, e.g. "cognitive=86400,reflection=3600"; unlisted namespaces are not cached
+LLM_CACHE_TTLS = os.environ.get(
+    "LLM_CACHE_TTLS",
+    "cognitive=86400,reflection=86400,journal_prompts=3600,affirmation=3600",
+)
+
+
+def parse_ttls(spec: str) -> Dict[str, float]:
+    ttls = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        namespace, _, seconds = item.partition("=")
+        ttls[namespace.strip()] = float(seconds)
+    return ttls
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Prompts are built from indented f-strings; whitespace changes shouldn't miss
+    return " ".join(prompt.split())
+
+
+class LLMCache:
+    """Two-tier cache of model responses: an in-memory LRU over a SQLite file.
+
+    Keys are sha256(model, namespace, normalized prompt or caller-supplied
+    key). Each namespace (agent type) has its own TTL; the disk tier is
+    trimmed least-recently-used first once it exceeds `max_disk_bytes`, so
+    results survive restarts and are shared by workers on the same host.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+        max_disk_bytes: int = int(LLM_CACHE_MAX_DISK_MB * 1024 * 1024),
+        ttls: Optional[Dict[str, float]] = None,
+    ):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttls = parse_ttls(LLM_CACHE_TTLS) if ttls is None else ttls
+        self._memory: OrderedDict = OrderedDict()  # key -> (text, expires_at)
+        self._local = threading.local()
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.disk_errors = 0
+
+        if path:
+            conn = self._conn()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY, namespace TEXT, value TEXT, size INTEGER,
+                    expires_at REAL, accessed_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+            conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._disk_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def ttl(self, namespace: Optional[str]) -> float:
+        return self.ttls.get(namespace, 0) if namespace else 0
+
+    @staticmethod
+    def make_key(model: str, namespace: str, prompt: str, key: Optional[str] = None) -> str:
+        material = key if key is not None else normalize_prompt(prompt)
+        return hashlib.sha256("\x1f".join((model, namespace, material)).encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if now < entry[1]:
+                self.memory_hits += 1
+                self._memory.move_to_end(key)
+                return entry[0]
+            del self._memory[key]
+
+        if self.path:
+            try:
+                row = await asyncio.to_thread(self._disk_get, key, now)
+            except sqlite3.Error as e:
+                self.disk_errors += 1
+                logger.warning("❌ LLM cache read failed: %s", e)
+                row = None
+            if row is not None:
+                self.disk_hits += 1
+                self._remember(key, *row)
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, namespace: str, text: str):
+        ttl = self.ttl(namespace)
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        self._remember(key, text, expires_at)
+        self.writes += 1
+        if self.path:
+            try:
+                await asyncio.to_thread(self._disk_put, key, namespace, text, expires_at)
+            except sqlite3.Error as e:
+                self.disk_errors += 1
+                logger.warning("❌ LLM cache write failed: %s", e)
+
+    def _remember(self, key: str, text: str, expires_at: float):
+        self._memory[key] = (text, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float):
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return row
+
+    def _disk_put(self, key: str, namespace: str, text: str, expires_at: float):
+        conn = self._conn()
+        size = len(text.encode())
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            old = conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, text, size, expires_at, now),
+            )
+            # Tracked incrementally; recounted whenever we evict
+            self._disk_bytes += size - (old[0] if old else 0)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        # Expired rows first, then least recently used until back under 90% of the limit
+        evicted = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+        target = self.max_disk_bytes * 0.9
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total > target:
+            cutoff = None
+            for accessed_at, size in conn.execute("SELECT accessed_at, size FROM llm_cache ORDER BY accessed_at"):
+                total -= size
+                cutoff = accessed_at
+                if total <= target:
+                    break
+            evicted += conn.execute("DELETE FROM llm_cache WHERE accessed_at <= ?", (cutoff,)).rowcount
+        self.evictions += evicted
+        self._disk_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "disk_errors": self.disk_errors,
+            "ttls": self.ttls,
+        }
@@ -0,0 +1,342 @@
+import asyncio
+import os
+import random
+import time
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from metrics import LLM_CALL_SECONDS, record_usage
+from resilience import LLM_BUDGETS, LLM_HEDGE, LLM_HEDGE_MIN_DELAY_SECONDS, LLM_HEDGE_MIN_SAMPLES, CircuitBreaker, CircuitOpenError, LatencyTracker, parse_budgets
+
+# Limits for the shared Gemini gateway
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "4"))
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_SECONDS = float(os.environ.get("LLM_BACKOFF_SECONDS", "0.5"))
+
+
+class LLMGateway:
+    """Single entry point for every Gemini call made by the agents.
+
+    Calls are native async, at most `max_in_flight` run at once, each call has a
+    deadline covering queueing and retries, and failures are retried with
+    jittered exponential backoff. Calls that name a `namespace` go through the
+    optional response cache (see llm_cache.py) first and get that namespace's
+    latency budget as their deadline.
+
+    For the latency tail: an attempt still running after the recent p95
+    latency of its namespace (of all calls, until the namespace has
+    LLM_HEDGE_MIN_SAMPLES of its own) is hedged with a duplicate request (first answer wins), and a
+    circuit breaker refuses calls with CircuitOpenError while Gemini is failing
+    or slow, so agents can serve their fallbacks immediately.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff: float = LLM_BACKOFF_SECONDS,
+        cache=None,
+        hedge: bool = LLM_HEDGE,
+        breaker: Optional[CircuitBreaker] = None,
+        model_factory: Optional[Callable[[], object]] = None,
+        model_name: Optional[str] = None,
+    ):
+        """Pass either `model`, or `model_factory` (and the `model_name` it will
+        have) to defer creating the model, and importing its SDK, to first use."""
+        self.model = model
+        self.model_factory = model_factory
+        self.model_name = model_name or getattr(model, "model_name", type(model).__name__)
+        self._model_lock = asyncio.Lock()
+        self.model_init_ms = None
+        self.cache = cache
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.budgets = parse_budgets(LLM_BUDGETS)
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyTracker()
+        self.namespace_latencies: Dict[str, LatencyTracker] = {}
+
+        # Metrics
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.total_wait = 0.0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def get_model(self):
+        if self.model is None:
+            async with self._model_lock:
+                if self.model is None:
+                    started = time.perf_counter()
+                    # SDK import and client setup are blocking; keep them off the event loop
+                    self.model = await asyncio.to_thread(self.model_factory)
+                    self.model_init_ms = round((time.perf_counter() - started) * 1000, 1)
+        return self.model
+
+    def _cache_key(self, prompt: str, namespace: Optional[str], cache_key: Optional[str]) -> Optional[str]:
+        if self.cache is None or self.cache.ttl(namespace) <= 0:
+            return None
+        return self.cache.make_key(self.model_name, namespace, prompt, cache_key)
+
+    async def generate(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        namespace: Optional[str] = None,
+        cache_key: Optional[str] = None,
+        cacheable: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """`cache_key` replaces the prompt in the cache key when the caller knows
+        a cheaper identity for the answer; `cacheable` vetoes storing a response."""
+        key = self._cache_key(prompt, namespace, cache_key)
+        if key:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        text = await self._generate_with_retries(prompt, timeout or self.budgets.get(namespace), namespace)
+        if key and (cacheable is None or cacheable(text)):
+            await self.cache.put(key, namespace, text)
+        return text
+
+    async def _generate_with_retries(self, prompt: str, timeout: Optional[float], namespace: Optional[str] = None) -> str:
+        deadline = time.monotonic() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            try:
+                return await self._call(prompt, deadline, namespace)
+            except CircuitOpenError:
+                raise
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.failures += 1
+                raise
+            except Exception:
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    self.failures += 1
+                    raise
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    async def _call(self, prompt: str, deadline: float, namespace: Optional[str] = None) -> str:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini circuit breaker is open")
+
+        started = time.monotonic()
+        try:
+            text = await asyncio.wait_for(self._hedged(prompt, namespace), timeout=remaining)
+        except Exception:
+            self.breaker.record(False, time.monotonic() - started)
+            raise
+        self.breaker.record(True, time.monotonic() - started)
+        return text
+
+    def hedge_delay(self, namespace: Optional[str] = None) -> Optional[float]:
+        if not self.hedge:
+            return None
+        # Namespaces differ widely in latency; the global window only stands in
+        # until this namespace has enough samples of its own
+        latencies = self.namespace_latencies.get(namespace or "none")
+        if latencies is None or len(latencies) < LLM_HEDGE_MIN_SAMPLES:
+            latencies = self.latencies
+        if len(latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, latencies.percentile(0.95))
+
+    async def _hedged(self, prompt: str, namespace: Optional[str] = None) -> str:
+        delay = self.hedge_delay(namespace)
+        primary = asyncio.ensure_future(self._generate(prompt, namespace))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            # Don't add load while calls are already queueing for a slot
+            if not done and self.waiting == 0:
+                self.hedges += 1
+                pending.add(asyncio.ensure_future(self._generate(prompt, namespace)))
+
+            error = None
+            while done or pending:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _generate(self, prompt: str, namespace: Optional[str] = None) -> str:
+        model = await self.get_model()
+        await self._acquire()
+        started = time.perf_counter()
+        labels = (namespace or "none", "error")
+        try:
+            response = await model.generate_content_async(prompt)
+            text = response.text
+            labels = (namespace or "none", "ok")
+        finally:
+            self._release()
+            LLM_CALL_SECONDS.observe(time.perf_counter() - started, labels)
+
+        record_usage(namespace, response)
+        latency = time.perf_counter() - started
+        self._record_latency(latency)
+        # Drive the hedge delay; streams are excluded
+        self.latencies.record(latency)
+        self.namespace_latencies.setdefault(namespace or "none", LatencyTracker()).record(latency)
+        return text
+
+    async def stream(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        namespace: Optional[str] = None,
+        cache_key: Optional[str] = None,
+        cacheable: Optional[Callable[[str], bool]] = None,
+    ) -> AsyncIterator[str]:
+        """Yield text chunks as the model produces them.
+
+        Streams are not retried once started; the deadline applies to the whole
+        stream. A cached response is replayed as a single chunk, and a completed
+        stream is cached like `generate`.
+        """
+        key = self._cache_key(prompt, namespace, cache_key)
+        if key:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        parts = []
+        async for text in self._stream(prompt, timeout or self.budgets.get(namespace), namespace):
+            parts.append(text)
+            yield text
+
+        text = "".join(parts)
+        if key and (cacheable is None or cacheable(text)):
+            await self.cache.put(key, namespace, text)
+
+    async def _stream(self, prompt: str, timeout: Optional[float], namespace: Optional[str] = None) -> AsyncIterator[str]:
+        deadline = time.monotonic() + (timeout or self.timeout)
+
+        def remaining() -> float:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise asyncio.TimeoutError()
+            return left
+
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini circuit breaker is open")
+
+        model = await self.get_model()
+        try:
+            await asyncio.wait_for(self._acquire(), timeout=remaining())
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.failures += 1
+            self.breaker.record(False, 0.0)
+            raise
+
+        started = time.perf_counter()
+        labels = (namespace or "none", "error")
+        chunk = None
+        try:
+            response = await asyncio.wait_for(model.generate_content_async(prompt, stream=True), timeout=remaining())
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining())
+                except StopAsyncIteration:
+                    break
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety metadata only)
+                    continue
+                if text:
+                    yield text
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.failures += 1
+            self.breaker.record(False, time.perf_counter() - started)
+            raise
+        except Exception:
+            self.failures += 1
+            self.breaker.record(False, time.perf_counter() - started)
+            raise
+        else:
+            labels = (namespace or "none", "ok")
+        finally:
+            self._release()
+            LLM_CALL_SECONDS.observe(time.perf_counter() - started, labels)
+
+        # Usage metadata on the last chunk covers the whole response
+        record_usage(namespace, chunk)
+        self._record_latency(time.perf_counter() - started)
+        # Whole-stream time isn't comparable to a generate call; count it as an outcome only
+        self.breaker.record(True, 0.0)
+
+    async def _acquire(self):
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.total_wait += time.perf_counter() - queued_at
+        self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def _record_latency(self, latency: float):
+        self.calls += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "avg_latency_ms": round(self.total_latency / self.calls * 1000, 1) if self.calls else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 1),
+            "avg_queue_wait_ms": round(self.total_wait / self.calls * 1000, 1) if self.calls else 0.0,
+            "p95_latency_ms": round((self.latencies.percentile(0.95) or 0) * 1000, 1),
+            "p95_latency_ms_by_namespace": {
+                namespace: round(latencies.percentile(0.95) * 1000, 1)
+                for namespace, latencies in sorted(self.namespace_latencies.items())
+            },
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "model_init_ms": self.model_init_ms,
+            "breaker": self.breaker.stats(),
+            "cache": self.cache.stats() if self.cache else None,
+        }
@@ -1,27 +1,155 @@
-from fastapi import FastAPI, HTTPException
-from models.schemas import MoodInput, MoodResponse, JournalEntryInput, JournalEntryResponse, InsightResponse, MoodTrendResponse
+from fastapi import FastAPI, HTTPException, Response
+from models.schemas import MoodInput, MoodResponse, JournalEntryInput, JournalEntryResponse, InsightResponse, MoodTrendResponse, MoodAnalyticsResponse, MoodBatchInput, JournalEntryBatchInput, BatchResponse, JournalSearchHit
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 from models.classes import CognitiveSupportResponse
-from utils import get_gemini_model
+from utils import GEMINI_MODEL_NAME, get_gemini_model
 from contextlib import asynccontextmanager
 from coordinator_agent import CoordinatorAgent
+from llm_gateway import LLMGateway
+from llm_cache import LLMCache
 import asyncio
+import json
+import logging
+import os
+import time
 from database import db
-from typing import List
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from mood_analytics import GRANULARITIES
+from pagination import decode_cursor, parse_fields
+from write_behind import MOOD_WRITE_BEHIND, BufferFullError, MoodWriteBuffer
+from sentiment import SENTIMENT_SCORER, LexiconSentimentScorer, LLMSentimentScorer, SentimentPipeline
+from search_index import JournalSearchService
+from jobs import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, JobQueueFullError, JobRunner
+from metrics import METRICS_PROFILER_ALLOWED, REGISTRY, TimedRoute, profiler
+from export import EXPORT_TABLES, export_ndjson, gzip_chunks
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+# Build clients and agents in the background right after start-up instead of on first use
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "false").lower() in ("1", "true", "yes")
+
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+startup = {"startup_ms": None, "warmup": {"enabled": STARTUP_WARMUP, "done": not STARTUP_WARMUP, "steps": {}}}
+warmup_task = None
+
+
+async def warm_up():
+  """Initialize what would otherwise be created by the first requests."""
+  async def build_agents():
+    coordinator.warm_up()
+
+  steps = (
+    ("agents", build_agents),
+    ("database", db.warm_up),
+    ("llm", llm.get_model),
+  )
+  for name, step in steps:
+    started = time.perf_counter()
+    error = None
+    try:
+      await step()
+    except Exception as e:
+      # A dependency that's down shouldn't keep the worker out of rotation; report it
+      error = str(e) or type(e).__name__
+      logger.warning("❌ Warm-up step %s failed: %s", name, error)
+    startup["warmup"]["steps"][name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "error": error}
+  startup["warmup"]["done"] = True
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-  global coordinator
-  model = get_gemini_model()  # ✅ Initialize once
-  coordinator = CoordinatorAgent(model, db)
-  print("✅ Gemini model initialized at startup")
+  global coordinator, llm, mood_buffer, sentiment, journal_search, jobs, warmup_task
+  started = time.perf_counter()
+  # All agents share one bounded, cached gateway; the Gemini SDK is imported
+  # and the model created on first use (or by warm-up), not here
+  llm = LLMGateway(model_factory=get_gemini_model, model_name=GEMINI_MODEL_NAME, cache=LLMCache())
+  # Agents, and the pool and insight loops, start on first demand (or with warm-up)
+  coordinator = CoordinatorAgent(llm, db)
+
+  # New journal entries are scored off the request path
+  scorer = LLMSentimentScorer(llm) if SENTIMENT_SCORER == "llm" else LexiconSentimentScorer()
+  sentiment = SentimentPipeline(db, scorer)
+  sentiment.start()
+  db.journal_entry_hooks.append(sentiment.enqueue)
+
+  journal_search = JournalSearchService(db)
+  db.journal_entry_hooks.append(journal_search.on_journal_entries)
+  search_task = asyncio.create_task(journal_search.run())  # Periodically persist dirty indexes
+
+  # Retrieval indexing and insight materialization for new data
+  db.mood_hooks.append(coordinator.on_moods)
+  db.journal_entry_hooks.append(coordinator.on_journal_entries)
+
+  # Long-running analyses can be submitted as jobs and polled for
+  jobs = JobRunner()
+  jobs.register("cognitive_support", lambda user_id: coordinator.get_cognitive_support(user_id, fresh=True))
+  jobs.start()
+
+  mood_buffer = None
+  if MOOD_WRITE_BEHIND:
+    # Coordinator state is updated from the flusher, once rows are committed
+    mood_buffer = MoodWriteBuffer(db, on_commit=lambda moods: [coordinator.log_mood(m.user_id, m.mood_value) for m in moods])
+    await mood_buffer.start()
+
+  # Queue depths and breaker state are read at scrape time
+  REGISTRY.gauge("mindgarden_llm_in_flight", "Gemini calls running.", lambda: llm.in_flight)
+  REGISTRY.gauge("mindgarden_llm_queue_depth", "Gemini calls waiting for a slot.", lambda: llm.waiting)
+  REGISTRY.gauge("mindgarden_llm_breaker_open", "1 while the Gemini circuit breaker is open.", lambda: llm.breaker.state == "open")
+  REGISTRY.gauge("mindgarden_job_queue_depth", "Jobs waiting for a worker.", lambda: jobs.stats()["queue_depth"])
+  REGISTRY.gauge("mindgarden_llm_cache_hit_rate", "LLM response cache hit rate.", lambda: llm.cache.stats()["hit_rate"] if llm.cache else None)
+
+  if STARTUP_WARMUP:
+    warmup_task = asyncio.create_task(warm_up())
+  startup["startup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+  logger.info("✅ Started in %.1f ms", startup["startup_ms"])
+
   yield  # ⬅ app runs after this
-  print("🛑 App shutting down")
+  if warmup_task:
+    warmup_task.cancel()
+  coordinator.stop()
+  await jobs.stop()
+  sentiment.stop()
+  search_task.cancel()
+  await journal_search.persist()
+  if mood_buffer:
+    await mood_buffer.stop()
+  profiler.stop()
+  await db.close()
+  logger.info("🛑 App shutting down")
 
 
 app = FastAPI(lifespan=lifespan)
+app.router.route_class = TimedRoute  # Per-route latency histograms; must be set before routes are added
+
+MAX_BATCH_ITEMS = 200
+
+
+def sse_event(event: str, data) -> str:
+  return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def parse_page_params(cursor: Optional[str], fields: Optional[str], model) -> Optional[List[str]]:
+  try:
+    if cursor:
+      decode_cursor(cursor)
+    return parse_fields(fields, model.model_fields)
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail=str(e))
+
+
+def page_response(response: Response, rows: list, next_cursor: Optional[str], projected: bool):
+  # The next page's cursor travels in a header so list bodies keep their shape
+  headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+  if projected:
+    # Partial rows don't fit the full response model
+    return JSONResponse(rows, headers=headers)
+  response.headers.update(headers)
+  return rows
 
 app.add_middleware(
   CORSMiddleware,
@@ -29,6 +157,7 @@ app.add_middleware(
   allow_credentials=True,
   allow_methods=["*"],
   allow_headers=["*"],
+  expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -37,18 +166,69 @@ def root():
   return {"message": "Backend is running!"}
 
 
+@app.get("/ready")
+def ready(response: Response):
+  """Readiness, unlike liveness (`/`): 503 until warm-up (if enabled) has finished."""
+  if not startup["warmup"]["done"]:
+    response.status_code = 503
+  return {"ready": startup["warmup"]["done"], **startup}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+  return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/debug/profiler")
+async def set_profiler(enabled: bool, interval_ms: float = 10):
+  """Start or stop the sampling profiler; only available with METRICS_PROFILER_ALLOWED."""
+  if not METRICS_PROFILER_ALLOWED:
+    raise HTTPException(status_code=404, detail="Not Found")
+  if not 1 <= interval_ms <= 1000:
+    raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+  if enabled:
+    profiler.start(interval_ms / 1000)
+  else:
+    profiler.stop()
+  return profiler.stats()
+
+
+@app.get("/debug/profiler", response_class=PlainTextResponse)
+def get_profile():
+  """Sampled stacks in folded format, e.g. for flamegraph.pl or speedscope."""
+  if not METRICS_PROFILER_ALLOWED:
+    raise HTTPException(status_code=404, detail="Not Found")
+  return PlainTextResponse(profiler.folded())
+
+
+@app.get("/stats")
+def get_stats():
+  return {
+    "llm": llm.stats(),
+    "cache": coordinator.cache.stats(),
+    "context": coordinator.context.stats(),
+    "mood_rollups": db.rollups.stats(),
+    "mood_write_buffer": mood_buffer.stats() if mood_buffer else None,
+    "sentiment": sentiment.stats(),
+    "retrieval": coordinator.retriever.stats(),
+    "insights": coordinator.materializer.stats(),
+    "agent_state": coordinator.state.stats(),
+    "jobs": jobs.stats(),
+    "pools": {
+      "journal_prompts": coordinator.prompt_pool.stats(),
+      "affirmations": coordinator.affirmation_pool.stats(),
+    },
+  }
+
+
 @app.get("/journal-prompt")
-async def get_prompt():
-  prompts = await asyncio.get_event_loop().run_in_executor(
-    None, coordinator.get_journal_prompts
-  )
+async def get_prompt(mood: str = None):
+  prompts = await coordinator.get_journal_prompts(mood)
   return {"prompts": prompts}
 
 @app.get("/affirmation-quote")
-async def get_affirmation():
-  quote = await asyncio.get_event_loop().run_in_executor(
-  None, coordinator.get_affirmations
-  )
+async def get_affirmation(mood: str = None):
+  quote = await coordinator.get_affirmations(mood)
 
   return {"quote": quote}
 
@@ -56,35 +236,59 @@ async def get_affirmation():
 
 @app.post("/mood-checkin", response_model=MoodResponse)
 async def checkin_mood(mood: MoodInput):
-  print(" POST request hit /mood-checkin ")
   try:
     # For now, using a valid UUID. You'll add auth later
     user_id = "550e8400-e29b-41d4-a716-446655440000"
+    if mood_buffer:
+      return await mood_buffer.submit(user_id, mood)
     mood_response = await db.create_mood(user_id, mood)
-    coordinator.log_mood(mood.mood_value)  # Keep existing coordinator logic
+    coordinator.log_mood(user_id, mood.mood_value)  # Keep existing coordinator logic
     return mood_response
+  except BufferFullError as e:
+    raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/mood-checkin/batch", response_model=BatchResponse)
+async def checkin_moods_batch(batch: MoodBatchInput):
+  if len(batch.items) > MAX_BATCH_ITEMS:
+    raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+  try:
+    user_id = "550e8400-e29b-41d4-a716-446655440000"
+    results, created = await db.create_moods_batch(user_id, batch.items)
+    for mood in created:
+      coordinator.log_mood(user_id, mood.mood_value)
+    return BatchResponse(results=results)
   except Exception as e:
     raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/insights")
-def get_insights():
-  return {"insights": coordinator.get_insights()}
+async def get_insights():
+  try:
+    user_id = "550e8400-e29b-41d4-a716-446655440000"
+    return await coordinator.get_insights(user_id)
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/wellness-tip")
 def get_wellness_tip():
-  return {"tip": coordinator.get_wellness_tip()}
+  user_id = "550e8400-e29b-41d4-a716-446655440000"
+  return {"tip": coordinator.get_wellness_tip(user_id)}
 
 
 @app.get("/goal")
 def get_goal():
-  return {"goal": coordinator.get_goal()}
+  user_id = "550e8400-e29b-41d4-a716-446655440000"
+  return {"goal": coordinator.get_goal(user_id)}
 
 
 @app.get("/garden-status")
 def garden_status():
-  return {"status": coordinator.get_garden_status()}
+  user_id = "550e8400-e29b-41d4-a716-446655440000"
+  return {"status": coordinator.get_garden_status(user_id)}
 
 
 # Helper endpoint to create test user
@@ -92,11 +296,7 @@ def garden_status():
 async def create_test_user():
   try:
     user_id = "550e8400-e29b-41d4-a716-446655440000"
-    response = db.supabase.table("users").insert({
-      "id": user_id,
-      "email": "test@mindgarden.com",
-      "username": "testuser"
-    }).execute()
+    await db.create_user(user_id, "test@mindgarden.com", "testuser")
     return {"message": "Test user created", "user_id": user_id}
   except Exception as e:
     return {"message": "User might already exist", "error": str(e)}
@@ -104,10 +304,12 @@ async def create_test_user():
 
 # New database-backed endpoints
 @app.get("/moods", response_model=List[MoodResponse])
-async def get_moods(limit: int = 30):
+async def get_moods(response: Response, limit: int = 30, cursor: Optional[str] = None, fields: Optional[str] = None):
+  field_list = parse_page_params(cursor, fields, MoodResponse)
   try:
     user_id = "550e8400-e29b-41d4-a716-446655440000"  # Replace with actual auth later
-    return await db.get_user_moods(user_id, limit)
+    rows, next_cursor = await db.get_user_moods_page(user_id, limit, cursor, field_list)
+    return page_response(response, rows, next_cursor, field_list is not None)
   except Exception as e:
     raise HTTPException(status_code=500, detail=str(e))
 
@@ -121,33 +323,129 @@ async def create_journal_entry(entry: JournalEntryInput):
     raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/journal/batch", response_model=BatchResponse)
+async def create_journal_entries_batch(batch: JournalEntryBatchInput):
+  if len(batch.items) > MAX_BATCH_ITEMS:
+    raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+  try:
+    user_id = "550e8400-e29b-41d4-a716-446655440000"  # Replace with actual auth later
+    results, _ = await db.create_journal_entries_batch(user_id, batch.items)
+    return BatchResponse(results=results)
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/journal/search", response_model=List[JournalSearchHit])
+async def search_journal_entries(q: str, limit: int = 10):
+  try:
+    user_id = "550e8400-e29b-41d4-a716-446655440000"  # Replace with actual auth later
+    return await journal_search.search(user_id, q, limit)
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/journal", response_model=List[JournalEntryResponse])
-async def get_journal_entries(limit: int = 20):
+async def get_journal_entries(response: Response, limit: int = 20, cursor: Optional[str] = None, fields: Optional[str] = None):
+  field_list = parse_page_params(cursor, fields, JournalEntryResponse)
   try:
     user_id = "550e8400-e29b-41d4-a716-446655440000"  # Replace with actual auth later
-    return await db.get_user_journal_entries(user_id, limit)
+    rows, next_cursor = await db.get_user_journal_entries_page(user_id, limit, cursor, field_list)
+    return page_response(response, rows, next_cursor, field_list is not None)
   except Exception as e:
     raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/insights-db", response_model=List[InsightResponse])
-async def get_insights_from_db(insight_type: str = None, limit: int = 10):
+async def get_insights_from_db(response: Response, insight_type: str = None, limit: int = 10, cursor: Optional[str] = None, fields: Optional[str] = None):
+  field_list = parse_page_params(cursor, fields, InsightResponse)
   try:
     user_id = "550e8400-e29b-41d4-a716-446655440000"  # Replace with actual auth later
-    return await db.get_user_insights(user_id, insight_type, limit)
+    rows, next_cursor = await db.get_user_insights_page(user_id, insight_type, limit, cursor, field_list)
+    return page_response(response, rows, next_cursor, field_list is not None)
   except Exception as e:
     raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/cognitiveSupport", response_model=CognitiveSupportResponse)
-async def cognitive_support():
+async def cognitive_support(fresh: bool = False):
   try:
     user_id = "550e8400-e29b-41d4-a716-446655440000"
-    print("POST request hit /cognitiveSupport ")
-    return await coordinator.get_cognitive_support(user_id)
+    return await coordinator.get_cognitive_support(user_id, fresh)
   except Exception as e:
     raise HTTPException(status_code=500, detail=str(e))
-  
+
+
+
+@app.post("/cognitiveSupport/jobs", status_code=202)
+async def cognitive_support_job(background: bool = False):
+  user_id = "550e8400-e29b-41d4-a716-446655440000"
+  try:
+    job = jobs.submit("cognitive_support", user_id, PRIORITY_BACKGROUND if background else PRIORITY_INTERACTIVE)
+  except JobQueueFullError as e:
+    raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+  return {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+  job = jobs.get(job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail="Job not found")
+  # wait > 0 long-polls until the job finishes (capped server-side)
+  return (await jobs.wait(job, wait)).to_dict()
+
+
+@app.post("/cognitiveSupport/stream")
+async def cognitive_support_stream():
+  user_id = "550e8400-e29b-41d4-a716-446655440000"
+
+  async def events():
+    try:
+      async for kind, field, value in coordinator.stream_cognitive_support(user_id):
+        if kind == "item":
+          yield sse_event(field, value)
+        elif kind == "field":
+          yield sse_event("field", {"name": field, "value": value})
+        else:
+          yield sse_event("done", value.model_dump())
+    except Exception as e:
+      yield sse_event("error", {"detail": str(e)})
+
+  return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/journal/reflect/stream")
+async def journal_reflection_stream(entry: JournalEntryInput):
+  async def events():
+    try:
+      async for chunk in coordinator.stream_journal_reflection(entry.content):
+        yield sse_event("token", {"text": chunk})
+      yield sse_event("done", {})
+    except Exception as e:
+      yield sse_event("error", {"detail": str(e)})
+
+  return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/export")
+async def export_history(types: Optional[str] = None, gzip: bool = False):
+  """Stream the user's moods, journal entries and insights as NDJSON, oldest first."""
+  record_types = [t.strip() for t in types.split(",") if t.strip()] if types else list(EXPORT_TABLES)
+  unknown = [t for t in record_types if t not in EXPORT_TABLES]
+  if unknown or not record_types:
+    raise HTTPException(status_code=400, detail=f"types must be a comma-separated subset of {', '.join(EXPORT_TABLES)}")
+
+  user_id = "550e8400-e29b-41d4-a716-446655440000"  # Replace with actual auth later
+  body = export_ndjson(db, user_id, record_types)
+  filename = f"mindgarden-export-{datetime.now(timezone.utc):%Y%m%d}.ndjson"
+  if gzip:
+    body, filename = gzip_chunks(body), filename + ".gz"
+  return StreamingResponse(
+    body,
+    media_type="application/gzip" if gzip else "application/x-ndjson",
+    headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+  )
+
 
 @app.get("/moods/weekly-trend", response_model=MoodTrendResponse)
 async def get_weekly_mood_trend():
@@ -156,3 +454,26 @@ async def get_weekly_mood_trend():
         return await db.get_weekly_mood_trend(user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/moods/analytics", response_model=MoodAnalyticsResponse)
+async def get_mood_analytics(start: Optional[datetime] = None, end: Optional[datetime] = None, granularity: str = "day", window: int = 7):
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if window < 1:
+        raise HTTPException(status_code=400, detail="window must be at least 1")
+
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=30)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    try:
+        user_id = "550e8400-e29b-41d4-a716-446655440000"  # Replace with actual auth later
+        return await db.get_mood_analytics(user_id, start, end, granularity, window)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,251 @@
+import bisect
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter as TallyCounter
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+
+# Whether the sampling profiler may be switched on at runtime (/debug/profiler)
+METRICS_PROFILER_ALLOWED = os.environ.get("METRICS_PROFILER_ALLOWED", "false").lower() in ("1", "true", "yes")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    __slots__ = ("name", "help", "label_names", "_values")
+
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three in-place updates."""
+
+    __slots__ = ("name", "help", "label_names", "buckets", "_series")
+
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[Tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, labels: Tuple = ()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {series[-2]}")
+            lines.append(f"{self.name}_count{label_text} {series[-1]}")
+        return lines
+
+
+class Registry:
+    """Metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Optional[float]]]] = {}
+
+    def counter(self, name: str, help: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, label_names))
+
+    def histogram(self, name: str, help: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, label_names, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], Optional[float]]):
+        """A value read from existing state at scrape time; re-registering replaces it."""
+        self._gauges[name] = (help, read)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for name, (help, read) in self._gauges.items():
+            try:
+                value = read()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {float(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "mindgarden_http_request_duration_seconds", "Time to produce a response, by route template.", ("method", "route", "status"),
+)
+DB_REQUEST_SECONDS = REGISTRY.histogram(
+    "mindgarden_db_request_duration_seconds", "PostgREST round trips, by operation.", ("operation", "outcome"),
+)
+AGENT_CALL_SECONDS = REGISTRY.histogram(
+    "mindgarden_agent_call_duration_seconds", "Agent method calls.", ("agent", "outcome"),
+)
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    "mindgarden_llm_call_duration_seconds", "Gemini calls (one attempt, excluding queueing).", ("namespace", "outcome"),
+)
+LLM_TOKENS = REGISTRY.counter(
+    "mindgarden_llm_tokens_total", "Gemini tokens from usage metadata.", ("namespace", "kind"),
+)
+
+
+def timed(histogram: Histogram, name: Optional[str] = None):
+    """Decorate an async function to observe its duration, labelled (name, outcome)."""
+
+    def decorator(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await fn(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                histogram.observe(time.perf_counter() - started, (label, outcome))
+
+        return wrapper
+
+    return decorator
+
+
+def record_usage(namespace: Optional[str], response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    namespace = namespace or "none"
+    LLM_TOKENS.inc((namespace, "prompt"), getattr(usage, "prompt_token_count", 0) or 0)
+    LLM_TOKENS.inc((namespace, "completion"), getattr(usage, "candidates_token_count", 0) or 0)
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that records request latency labelled with the route template.
+
+    For streaming responses this is the time until the response starts.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def timed_handler(request):
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except HTTPException as e:
+                status = e.status_code
+                raise
+            except RequestValidationError:
+                status = 422
+                raise
+            finally:
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, (request.method, route, status))
+
+        return timed_handler
+
+
+class SamplingProfiler:
+    """Samples the event-loop thread's stack from a background thread.
+
+    Off by default; while running, every `interval` seconds the main thread's
+    current frame is walked and the collapsed stack counted. `folded()` returns
+    the counts in the folded-stack format flame graph tools read.
+    """
+
+    def __init__(self):
+        self.interval = 0.01
+        self.samples = 0
+        self._stacks: TallyCounter = TallyCounter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target = threading.main_thread().ident
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval: float = 0.01):
+        if self.running:
+            return
+        self.interval = interval
+        self._target = threading.get_ident()  # called from the event loop thread
+        self._stacks.clear()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self, limit: int = 200) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common(limit)) + "\n"
+
+    def stats(self) -> dict:
+        return {"running": self.running, "interval_ms": self.interval * 1000, "samples": self.samples}
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,54 @@
+-- Per-user, per-day mood aggregates maintained incrementally on every check-in.
+begin;
+
+create table if not exists mood_daily_rollups (
+  user_id uuid not null references users(id) on delete cascade,
+  day date not null,
+  score_sum bigint not null default 0,
+  score_count integer not null default 0,
+  score_min integer not null,
+  score_max integer not null,
+  primary key (user_id, day)
+);
+
+-- Superseded by the trigger below; a separate RPC after the insert wasn't atomic with it.
+drop function if exists apply_mood_rollups(jsonb);
+
+-- Folds every inserted check-in into its UTC day, in the inserting transaction.
+-- Rows skipped by `on conflict do nothing` never reach the transition table.
+create or replace function roll_up_inserted_moods()
+returns trigger
+language plpgsql
+as $$
+begin
+  insert into mood_daily_rollups as r (user_id, day, score_sum, score_count, score_min, score_max)
+  select user_id, (created_at at time zone 'utc')::date, sum(mood_score), count(*), min(mood_score), max(mood_score)
+  from inserted_moods
+  group by 1, 2
+  on conflict (user_id, day) do update set
+    score_sum = r.score_sum + excluded.score_sum,
+    score_count = r.score_count + excluded.score_count,
+    score_min = least(r.score_min, excluded.score_min),
+    score_max = greatest(r.score_max, excluded.score_max);
+  return null;
+end;
+$$;
+
+-- Block check-ins until the trigger exists, so the backfill and the trigger don't overlap or miss rows.
+lock table moods in share row exclusive mode;
+
+drop trigger if exists moods_daily_rollup on moods;
+create trigger moods_daily_rollup
+  after insert on moods
+  referencing new table as inserted_moods
+  for each statement
+  execute function roll_up_inserted_moods();
+
+-- One-off backfill from existing check-ins.
+insert into mood_daily_rollups (user_id, day, score_sum, score_count, score_min, score_max)
+select user_id, (created_at at time zone 'utc')::date, sum(mood_score), count(*), min(mood_score), max(mood_score)
+from moods
+group by 1, 2
+on conflict (user_id, day) do nothing;
+
+commit;
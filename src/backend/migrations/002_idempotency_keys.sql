@@ -0,0 +1,8 @@
+-- Client-supplied idempotency keys so offline batches can be retried safely.
+alter table moods add column if not exists idempotency_key text;
+alter table journal_entries add column if not exists idempotency_key text;
+
+create unique index if not exists moods_user_idempotency_key
+  on moods (user_id, idempotency_key);
+create unique index if not exists journal_entries_user_idempotency_key
+  on journal_entries (user_id, idempotency_key);
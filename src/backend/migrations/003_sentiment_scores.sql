@@ -0,0 +1,15 @@
+-- Bulk write-back for the background sentiment pipeline: p_scores is a JSON array of {id, score}.
+create or replace function set_sentiment_scores(p_scores jsonb)
+returns void
+language sql
+as $$
+  update journal_entries as j
+  set sentiment_score = s.score
+  from jsonb_to_recordset(p_scores) as s(id uuid, score double precision)
+  where j.id = s.id;
+$$;
+
+-- Start-up sweep for entries left unscored: only those rows, in keyset order.
+create index if not exists journal_entries_unscored
+  on journal_entries (created_at, id)
+  where sentiment_score is null;
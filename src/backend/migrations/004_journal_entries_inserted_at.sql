@@ -0,0 +1,8 @@
+-- Write-order watermark for the journal search index catch-up: created_at can
+-- be set by the client (/journal/batch), so it says nothing about what was
+-- stored since a snapshot was taken.
+alter table journal_entries
+  add column if not exists inserted_at timestamptz not null default now();
+
+create index if not exists journal_entries_user_inserted_at
+  on journal_entries (user_id, inserted_at);
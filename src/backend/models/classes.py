@@ -1,7 +1,11 @@
 from pydantic import BaseModel
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 class CognitiveSupportResponse(BaseModel):
     coping_mechanism: str
     cognitive_distortion: str
-    stress_patterns: List[str]
\ No newline at end of file
+    stress_patterns: List[str]
+    summary: str = ""
+    # Set when served from a materialized insight
+    generated_at: Optional[datetime] = None
@@ -8,6 +8,14 @@ class MoodInput(BaseModel):
     mood_score: int
     notes: Optional[str] = None
 
+class MoodBatchItem(MoodInput):
+    idempotency_key: str
+    # When the check-in happened on the device; defaults to time of upload
+    created_at: Optional[datetime] = None
+
+class MoodBatchInput(BaseModel):
+    items: List[MoodBatchItem]
+
 class MoodResponse(BaseModel):
     id: str
     user_id: str
@@ -20,6 +28,13 @@ class JournalEntryInput(BaseModel):
     title: Optional[str] = None
     content: str
 
+class JournalEntryBatchItem(JournalEntryInput):
+    idempotency_key: str
+    created_at: Optional[datetime] = None
+
+class JournalEntryBatchInput(BaseModel):
+    items: List[JournalEntryBatchItem]
+
 class JournalEntryResponse(BaseModel):
     id: str
     user_id: str
@@ -29,6 +44,12 @@ class JournalEntryResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+class JournalSearchHit(BaseModel):
+    id: str
+    title: Optional[str]
+    created_at: datetime
+    score: float
+
 class InsightResponse(BaseModel):
     id: str
     user_id: str
@@ -37,6 +58,15 @@ class InsightResponse(BaseModel):
     data: Optional[dict]
     created_at: datetime
 
+class BatchItemResult(BaseModel):
+    idempotency_key: str
+    status: str  # "created" or "duplicate"
+    id: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+
 class UserResponse(BaseModel):
     id: str
     email: str
@@ -50,3 +80,17 @@ class MoodTrendPoint(BaseModel):
 
 class MoodTrendResponse(BaseModel):
     trend: List[MoodTrendPoint]
+
+class MoodAnalyticsPoint(MoodTrendPoint):
+    bucket_start: datetime
+    min_score: int
+    max_score: int
+    volatility: float
+    rolling_average: float
+
+class MoodAnalyticsResponse(BaseModel):
+    granularity: str
+    start: datetime
+    end: datetime
+    window: int
+    trend: List[MoodAnalyticsPoint]
\ No newline at end of file
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from models.schemas import MoodAnalyticsPoint
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+
+def to_datetime64(timestamps: list) -> np.ndarray:
+    """Parse ISO timestamps from the API into UTC datetime64[s]."""
+    if all(ts.endswith(("+00:00", "Z")) for ts in timestamps):
+        # Fast path: PostgREST returns UTC; drop fractional seconds and the offset
+        return np.array([ts[:19] for ts in timestamps], dtype="datetime64[s]")
+    return np.array(
+        [
+            datetime.fromisoformat(ts.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
+            for ts in timestamps
+        ],
+        dtype="datetime64[s]",
+    )
+
+
+def bucket_starts(timestamps: np.ndarray, granularity: str) -> np.ndarray:
+    if granularity == "hour":
+        return timestamps.astype("datetime64[h]").astype("datetime64[s]")
+    if granularity == "day":
+        return timestamps.astype("datetime64[D]").astype("datetime64[s]")
+    if granularity == "week":
+        # Weeks start on Monday; day 0 of the epoch (1970-01-01) was a Thursday
+        days = timestamps.astype("datetime64[D]").astype(np.int64)
+        return (days - (days + 3) % 7).astype("datetime64[D]").astype("datetime64[s]")
+    if granularity == "month":
+        return timestamps.astype("datetime64[M]").astype("datetime64[s]")
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def aggregate_moods(scores: np.ndarray, timestamps: np.ndarray, granularity: str = "day", window: int = 7) -> list:
+    """Bucket mood scores by time and compute per-bucket statistics.
+
+    `rolling_average` is the count-weighted mean over the last `window`
+    non-empty buckets; `volatility` is the standard deviation within a bucket.
+    """
+    if len(scores) == 0:
+        return []
+
+    scores = scores.astype(np.float64)
+    keys, inverse = np.unique(bucket_starts(timestamps, granularity), return_inverse=True)
+
+    counts = np.bincount(inverse)
+    sums = np.bincount(inverse, weights=scores)
+    squares = np.bincount(inverse, weights=scores * scores)
+
+    order = np.argsort(inverse, kind="stable")
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    mins = np.minimum.reduceat(scores[order], starts)
+    maxs = np.maximum.reduceat(scores[order], starts)
+
+    means = sums / counts
+    volatility = np.sqrt(np.clip(squares / counts - means * means, 0, None))
+
+    cum_sums = np.concatenate(([0.0], np.cumsum(sums)))
+    cum_counts = np.concatenate(([0], np.cumsum(counts)))
+    idx = np.arange(1, len(keys) + 1)
+    lo = np.maximum(idx - window, 0)
+    rolling = (cum_sums[idx] - cum_sums[lo]) / (cum_counts[idx] - cum_counts[lo])
+
+    bucket_times = keys.astype(datetime)
+    return [
+        MoodAnalyticsPoint(
+            date=bucket_times[i].date(),
+            bucket_start=bucket_times[i].replace(tzinfo=timezone.utc),
+            average_score=round(float(means[i]), 2),
+            count=int(counts[i]),
+            min_score=int(mins[i]),
+            max_score=int(maxs[i]),
+            volatility=round(float(volatility[i]), 2),
+            rolling_average=round(float(rolling[i]), 2),
+        )
+        for i in range(len(keys))
+    ]
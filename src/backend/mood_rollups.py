@@ -0,0 +1,49 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+ROLLUP_CACHE_TTL_SECONDS = float(os.environ.get("ROLLUP_CACHE_TTL_SECONDS", "300"))
+ROLLUP_CACHE_MAX_USERS = int(os.environ.get("ROLLUP_CACHE_MAX_USERS", "1024"))
+
+
+def rollup_day(created_at) -> str:
+    """UTC calendar day a check-in counts towards, as an ISO date string."""
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date().isoformat()
+
+
+class MoodRollupCache:
+    """Recent daily rollup rows per user, dropped whenever that user checks in."""
+
+    def __init__(self, ttl: float = ROLLUP_CACHE_TTL_SECONDS, max_users: int = ROLLUP_CACHE_MAX_USERS):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._entries: OrderedDict = OrderedDict()  # user_id -> (expires_at, since, rows)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, since: str) -> Optional[list]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic() or entry[1] != since:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(user_id)
+        return entry[2]
+
+    def put(self, user_id: str, since: str, rows: list):
+        self._entries[user_id] = (time.monotonic() + self.ttl, since, rows)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,33 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+
+def encode_cursor(row: dict) -> str:
+    """Opaque cursor pointing just past `row` in (created_at, id) descending order."""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """(created_at, id) from a cursor, re-serialized from a parsed timestamp and
+    UUID: both end up inside a PostgREST `or=` filter, so nothing else may pass."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at.replace('Z', '+00:00')).isoformat(), str(uuid.UUID(row_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """Validate a comma-separated `fields` projection; None means all columns."""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
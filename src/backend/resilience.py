@@ -0,0 +1,131 @@
+import math
+import os
+import time
+from collections import deque
+from typing import Dict, Optional
+
+# Per-endpoint latency budgets (seconds) by gateway namespace, e.g. "cognitive=8,affirmation=3"
+LLM_BUDGETS = os.environ.get("LLM_BUDGETS", "cognitive=8,reflection=8,journal_prompts=4,affirmation=3")
+
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.environ.get("LLM_HEDGE_MIN_DELAY_SECONDS", "0.2"))
+
+LLM_BREAKER_WINDOW = int(os.environ.get("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_ERROR_RATE = float(os.environ.get("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_SLOW_SECONDS = float(os.environ.get("LLM_BREAKER_SLOW_SECONDS", "10"))
+LLM_BREAKER_SLOW_RATE = float(os.environ.get("LLM_BREAKER_SLOW_RATE", "0.8"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.environ.get("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+
+def parse_budgets(spec: str) -> Dict[str, float]:
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, seconds = item.partition("=")
+        budgets[name.strip()] = float(seconds)
+    return budgets
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, latency: float):
+        self._samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+class CircuitBreaker:
+    """Trips when recent calls fail or are slow too often.
+
+    closed: calls flow and outcomes are recorded over the last `window` calls.
+    open: calls are refused (callers serve a fallback) for `cooldown` seconds.
+    half_open: one probe call is let through; success closes the breaker,
+    failure opens it again.
+    """
+
+    def __init__(
+        self,
+        window: int = LLM_BREAKER_WINDOW,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        error_rate: float = LLM_BREAKER_ERROR_RATE,
+        slow_seconds: float = LLM_BREAKER_SLOW_SECONDS,
+        slow_rate: float = LLM_BREAKER_SLOW_RATE,
+        cooldown: float = LLM_BREAKER_COOLDOWN_SECONDS,
+    ):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)  # (ok, slow)
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probe_started = None
+
+        self.opened = 0
+        self.short_circuited = 0
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.cooldown:
+                self.short_circuited += 1
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            # A probe that never reported back (e.g. cancelled) doesn't block forever
+            now = time.monotonic()
+            if self._probe_started is not None and now - self._probe_started < self.cooldown:
+                self.short_circuited += 1
+                return False
+            self._probe_started = now
+        return True
+
+    def record(self, ok: bool, latency: float):
+        slow = latency >= self.slow_seconds
+        if self.state == "open":
+            return  # a call that started before the breaker tripped
+        if self.state == "half_open":
+            self._probe_started = None
+            if ok and not slow:
+                self.state = "closed"
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append((ok, slow))
+        if len(self._outcomes) < self.min_calls:
+            return
+        errors = sum(1 for ok, _ in self._outcomes if not ok) / len(self._outcomes)
+        slows = sum(1 for _, slow in self._outcomes if slow) / len(self._outcomes)
+        if errors >= self.error_rate or slows >= self.slow_rate:
+            self._open()
+
+    def _open(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "opened": self.opened,
+            "short_circuited": self.short_circuited,
+        }
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "300"))
+# How long an expired entry may still be served while it is refreshed in the background (0 = off)
+RESPONSE_CACHE_STALE_SECONDS = float(os.environ.get("RESPONSE_CACHE_STALE_SECONDS", "0"))
+
+
+class ResponseCache:
+    """In-memory TTL + LRU cache for agent results with single-flight loading.
+
+    Concurrent misses for the same key share one upstream call, and expired
+    entries can optionally be served stale while a background refresh runs.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        stale_ttl: float = RESPONSE_CACHE_STALE_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, expires_at)
+        self._inflight: dict = {}  # key -> asyncio.Task
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable],
+        cacheable: Optional[Callable[[object], bool]] = None,
+    ):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if now < expires_at:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if now < expires_at + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self._start(key, compute, cacheable)
+                return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._start(key, compute, cacheable)
+        # Shield so one caller disconnecting doesn't cancel the load for everyone else
+        return await asyncio.shield(task)
+
+    def _start(self, key: str, compute, cacheable) -> asyncio.Task:
+        async def load():
+            try:
+                value = await compute()
+                if cacheable is None or cacheable(value):
+                    self._store(key, value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(load())
+        # Background refreshes may have nobody awaiting them; don't warn about their errors
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return task
+
+    def _store(self, key: str, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced + self.stale_hits
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.stale_hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,294 @@
+import asyncio
+import bisect
+import fcntl
+import gzip
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_DIR = os.environ.get("SEARCH_INDEX_DIR", "search_index")
+SEARCH_INDEX_PERSIST_SECONDS = float(os.environ.get("SEARCH_INDEX_PERSIST_SECONDS", "30"))
+# How stale an index may get before a search first catches up with entries other
+# workers stored, and how far behind the watermark each catch-up re-reads
+# (inserts whose transactions committed out of order)
+SEARCH_INDEX_SYNC_SECONDS = float(os.environ.get("SEARCH_INDEX_SYNC_SECONDS", "30"))
+SEARCH_INDEX_SYNC_OVERLAP_SECONDS = float(os.environ.get("SEARCH_INDEX_SYNC_OVERLAP_SECONDS", "60"))
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "i", "if", "in", "is", "it", "me", "my",
+    "of", "on", "or", "so", "that", "the", "to", "was", "we", "with", "you",
+}
+FORMAT_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc)
+
+
+class JournalSearchIndex:
+    """Inverted index with BM25 ranking over one user's journal entries.
+
+    Documents are stored under small integer ids; postings map a term to
+    {doc: term frequency}. The vocabulary is kept sorted so the last query
+    term can be matched as a prefix.
+
+    `synced_through` is the latest `inserted_at` among the DB rows added: every
+    entry stored before it is in the index. Reads and writes take `_mutex`, as
+    they run in worker threads.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.entry_ids: List[str] = []  # doc -> journal entry id
+        self.titles: List[Optional[str]] = []
+        self.created_at: List[str] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.vocabulary: List[str] = []  # sorted
+        self.total_length = 0
+        self.synced_through: Optional[str] = None
+        self._docs_by_entry: Dict[str, int] = {}
+        self._mutex = threading.Lock()
+
+    def __len__(self):
+        return len(self.entry_ids)
+
+    def add(self, entry_id: str, title: Optional[str], content: str, created_at: str):
+        if entry_id in self._docs_by_entry:
+            return
+        doc = len(self.entry_ids)
+        self.entry_ids.append(entry_id)
+        self.titles.append(title)
+        self.created_at.append(created_at)
+        self._docs_by_entry[entry_id] = doc
+
+        terms = tokenize(f"{title or ''} {content}")
+        self.doc_lengths.append(len(terms))
+        self.total_length += len(terms)
+        for term, tf in Counter(terms).items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                bisect.insort(self.vocabulary, term)
+            postings[doc] = tf
+
+    def add_rows(self, rows: List[dict]):
+        """Add journal rows read from the DB and advance `synced_through`."""
+        with self._mutex:
+            for row in rows:
+                self.add(row["id"], row.get("title"), row["content"], row["created_at"])
+            inserted = [_parse_timestamp(row["inserted_at"]) for row in rows if row.get("inserted_at")]
+            if inserted and (self.synced_through is None or max(inserted) > _parse_timestamp(self.synced_through)):
+                self.synced_through = max(inserted).isoformat()
+
+    def add_entries(self, entries):
+        """Add entries written through this worker (JournalEntryResponse)."""
+        with self._mutex:
+            for entry in entries:
+                self.add(entry.id, entry.title, entry.content, entry.created_at.isoformat())
+
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\uffff")
+        return self.vocabulary[start:end]
+
+    def search(self, query: str, limit: int = 10, prefix: bool = True) -> List[dict]:
+        with self._mutex:
+            return self._search(query, limit, prefix)
+
+    def _search(self, query: str, limit: int, prefix: bool) -> List[dict]:
+        terms = tokenize(query)
+        if not terms or not self.entry_ids:
+            return []
+
+        groups = [[term] for term in terms[:-1]]
+        # The last term is usually still being typed: match it as a prefix
+        groups.append(self._expand(terms[-1]) if prefix else [terms[-1]])
+
+        n = len(self.entry_ids)
+        avg_length = self.total_length / n
+        scores: Dict[int, float] = {}
+        for group in groups:
+            for term in group:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, tf in postings.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[doc] / avg_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [
+            {
+                "id": self.entry_ids[doc],
+                "title": self.titles[doc],
+                "created_at": self.created_at[doc],
+                "score": round(score, 4),
+            }
+            for doc, score in ranked
+        ]
+
+    def to_dict(self) -> dict:
+        """Compact form: postings flattened to [doc, tf, doc, tf, ...]."""
+        with self._mutex:
+            return {
+                "version": FORMAT_VERSION,
+                "synced_through": self.synced_through,
+                "entry_ids": list(self.entry_ids),
+                "titles": list(self.titles),
+                "created_at": list(self.created_at),
+                "doc_lengths": list(self.doc_lengths),
+                "postings": {
+                    term: [x for pair in postings.items() for x in pair]
+                    for term, postings in self.postings.items()
+                },
+            }
+
+    @staticmethod
+    def write(path: str, data: dict) -> bool:
+        """Replace the snapshot at `path`, shared by all workers, unless the one
+        there is synced further. The `.lock` file holds its watermark."""
+        with open(f"{path}.lock", "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                lock.seek(0)
+                on_disk = lock.read().strip()
+                ours = data.get("synced_through")
+                if on_disk and (ours is None or _parse_timestamp(on_disk) > _parse_timestamp(ours)):
+                    return False
+
+                tmp_path = f"{path}.tmp"
+                with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                    json.dump(data, f, separators=(",", ":"))
+                os.replace(tmp_path, path)
+                lock.truncate(0)
+                lock.write(ours or "")
+                return True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["JournalSearchIndex"]:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != FORMAT_VERSION:
+            return None
+
+        index = cls()
+        index.synced_through = data.get("synced_through")
+        index.entry_ids = data["entry_ids"]
+        index.titles = data["titles"]
+        index.created_at = data["created_at"]
+        index.doc_lengths = data["doc_lengths"]
+        index.total_length = sum(index.doc_lengths)
+        index.postings = {
+            term: dict(zip(flat[::2], flat[1::2]))
+            for term, flat in data["postings"].items()
+        }
+        index.vocabulary = sorted(index.postings)
+        index._docs_by_entry = {entry_id: doc for doc, entry_id in enumerate(index.entry_ids)}
+        return index
+
+
+class JournalSearchService:
+    """Per-user search indexes: loaded from disk, caught up with the DB by
+    `inserted_at`, updated as entries are written and persisted when dirty.
+    Building, searching and persisting run in worker threads."""
+
+    def __init__(self, db, index_dir: str = SEARCH_INDEX_DIR):
+        self.db = db
+        self.index_dir = index_dir
+        self._indexes: Dict[str, JournalSearchIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._synced: Dict[str, float] = {}  # monotonic time of the last catch-up
+        self._dirty = set()
+        self._pending: Dict[str, list] = {}  # entries written through this worker, not yet added
+        os.makedirs(index_dir, exist_ok=True)
+
+    def _path(self, user_id: str) -> str:
+        return os.path.join(self.index_dir, f"{user_id}.idx.gz")
+
+    async def get_index(self, user_id: str) -> JournalSearchIndex:
+        """The user's index, loaded on first use and caught up when stale."""
+        self._pending.setdefault(user_id, [])
+        # One load/catch-up per user, however many searches are waiting on it
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = await asyncio.to_thread(JournalSearchIndex.load, self._path(user_id)) or JournalSearchIndex()
+                self._indexes[user_id] = index
+            if time.monotonic() - self._synced.get(user_id, -math.inf) >= SEARCH_INDEX_SYNC_SECONDS:
+                await self._catch_up(user_id, index)
+
+        pending, self._pending[user_id] = self._pending[user_id], []
+        if pending:
+            await asyncio.to_thread(index.add_entries, pending)
+            self._dirty.add(user_id)
+        return index
+
+    async def _catch_up(self, user_id: str, index: JournalSearchIndex):
+        """Add the entries stored since the index's watermark, by any worker and
+        whatever their `created_at`; entries already indexed are skipped."""
+        since = None
+        if index.synced_through:
+            since = (_parse_timestamp(index.synced_through) - timedelta(seconds=SEARCH_INDEX_SYNC_OVERLAP_SECONDS)).isoformat()
+
+        synced_through = index.synced_through
+        async for rows in self.db.iter_user_journal_entries(user_id, since):
+            await asyncio.to_thread(index.add_rows, rows)
+        self._synced[user_id] = time.monotonic()
+        if index.synced_through != synced_through:
+            self._dirty.add(user_id)
+
+    def on_journal_entries(self, entries):
+        for entry in entries:
+            # Users without an index yet pick the entry up from the DB on first load
+            pending = self._pending.get(entry.user_id)
+            if pending is not None:
+                pending.append(entry)
+                self._dirty.add(entry.user_id)
+
+    async def search(self, user_id: str, query: str, limit: int = 10) -> List[dict]:
+        index = await self.get_index(user_id)
+        return await asyncio.to_thread(index.search, query, limit)
+
+    async def persist(self):
+        for user_id in list(self._dirty):
+            self._dirty.discard(user_id)
+            try:
+                index = await self.get_index(user_id)
+                # Snapshot, compress and write off the loop
+                await asyncio.to_thread(lambda: JournalSearchIndex.write(self._path(user_id), index.to_dict()))
+            except BaseException:
+                self._dirty.add(user_id)
+                raise
+
+    async def run(self, interval: float = SEARCH_INDEX_PERSIST_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.persist()
+            except Exception as e:
+                logger.error("❌ Failed to persist search indexes: %s", e)
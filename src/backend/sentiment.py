@@ -0,0 +1,255 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import time
+from typing import List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_SCORER = os.environ.get("SENTIMENT_SCORER", "lexicon")  # "lexicon" or "llm"
+SENTIMENT_BATCH_SIZE = int(os.environ.get("SENTIMENT_BATCH_SIZE", "64"))
+SENTIMENT_FLUSH_SECONDS = float(os.environ.get("SENTIMENT_FLUSH_SECONDS", "2"))
+SENTIMENT_MAX_PENDING = int(os.environ.get("SENTIMENT_MAX_PENDING", "10000"))
+SENTIMENT_MAX_ATTEMPTS = int(os.environ.get("SENTIMENT_MAX_ATTEMPTS", "5"))
+# Held by the one worker sweeping unscored entries; the others skip the sweep
+SENTIMENT_SWEEP_LOCK_PATH = os.environ.get("SENTIMENT_SWEEP_LOCK_PATH", "sentiment_sweep.lock")
+
+TOKEN_RE = re.compile(r"[a-z']+")
+NEGATIONS = {"not", "no", "never", "nothing", "nobody", "hardly", "don't", "didn't", "isn't", "wasn't", "can't", "couldn't", "won't"}
+
+# Small valence lexicon (-3..3) tuned for journaling vocabulary
+LEXICON = {
+    "happy": 3, "joy": 3, "joyful": 3, "love": 3, "loved": 3, "grateful": 3, "thankful": 2, "excited": 2,
+    "calm": 2, "peaceful": 2, "relaxed": 2, "proud": 2, "hopeful": 2, "good": 2, "great": 3, "amazing": 3,
+    "wonderful": 3, "fun": 2, "enjoyed": 2, "better": 1, "fine": 1, "okay": 1, "content": 2, "confident": 2,
+    "motivated": 2, "energized": 2, "accomplished": 2, "supported": 2, "safe": 1, "rested": 1, "laugh": 2,
+    "laughed": 2, "smile": 2, "win": 2, "success": 2, "kind": 1, "friend": 1, "friends": 1,
+    "sad": -2, "unhappy": -2, "depressed": -3, "lonely": -2, "alone": -1, "anxious": -2, "anxiety": -2,
+    "worried": -2, "worry": -2, "stress": -2, "stressed": -2, "overwhelmed": -2, "tired": -1, "exhausted": -2,
+    "angry": -2, "mad": -2, "frustrated": -2, "annoyed": -1, "upset": -2, "afraid": -2, "scared": -2,
+    "fear": -2, "hurt": -2, "cry": -2, "cried": -2, "hate": -3, "awful": -3, "terrible": -3, "bad": -2,
+    "worse": -2, "worst": -3, "fail": -2, "failed": -2, "failure": -2, "guilty": -2, "ashamed": -2,
+    "hopeless": -3, "panic": -3, "pain": -2, "sick": -1, "bored": -1, "lost": -1, "regret": -2,
+}
+
+
+class LexiconSentimentScorer:
+    """Fast local scorer: lexicon valence with negation, normalised to [-1, 1]."""
+
+    alpha = 15.0  # normalisation constant (as in VADER's compound score)
+
+    async def score_batch(self, texts: List[str]) -> List[float]:
+        return self.score_texts(texts)
+
+    def score_texts(self, texts: List[str]) -> List[float]:
+        if not texts:
+            return []
+        valences = []
+        doc_ids = []
+        for doc_id, text in enumerate(texts):
+            negate = False
+            for token in TOKEN_RE.findall(text.lower()):
+                if token in NEGATIONS:
+                    negate = True
+                    continue
+                value = LEXICON.get(token)
+                if value is not None:
+                    valences.append(-value if negate else value)
+                    doc_ids.append(doc_id)
+                negate = False
+
+        totals = np.bincount(np.array(doc_ids, dtype=np.int64), weights=np.array(valences, dtype=np.float64), minlength=len(texts))
+        scores = totals / np.sqrt(totals * totals + self.alpha)
+        return [round(float(s), 3) for s in scores]
+
+
+class LLMSentimentScorer:
+    """Scores many entries with a single LLM call; falls back to the lexicon on bad output."""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.fallback = LexiconSentimentScorer()
+
+    async def score_batch(self, texts: List[str]) -> List[float]:
+        numbered = "\n".join(f"{i + 1}. {json.dumps(text[:2000])}" for i, text in enumerate(texts))
+        prompt = (
+            f"Rate the sentiment of each of the following {len(texts)} journal entries on a scale "
+            "from -1 (very negative) to 1 (very positive). Return ONLY a JSON array of "
+            f"{len(texts)} numbers in the same order.\n\n{numbered}"
+        )
+
+        try:
+            response = await self.llm.generate(prompt)
+            match = re.search(r"\[.*\]", response, re.DOTALL)
+            scores = json.loads(match.group()) if match else []
+            if len(scores) == len(texts):
+                return [round(max(-1.0, min(1.0, float(s))), 3) for s in scores]
+        except Exception as e:
+            logger.warning("❌ LLM sentiment scoring failed: %s", e)
+        return self.fallback.score_texts(texts)
+
+
+class SentimentPipeline:
+    """Background batch scorer for new journal entries.
+
+    `enqueue` never blocks the request path; a worker drains the queue in
+    batches, scores them and writes all scores back in one bulk update. A
+    failed batch is retried with backoff; entries still unscored after
+    `max_attempts` (or queued in a process that died) keep a NULL score and
+    are re-enqueued by the sweep that runs on start. Only the worker holding
+    the flock on `sweep_lock_path` sweeps, and it holds it until the swept
+    entries are scored, so workers starting meanwhile don't score them again.
+    """
+
+    def __init__(
+        self,
+        db,
+        scorer,
+        batch_size: int = SENTIMENT_BATCH_SIZE,
+        flush_interval: float = SENTIMENT_FLUSH_SECONDS,
+        max_pending: int = SENTIMENT_MAX_PENDING,
+        max_attempts: int = SENTIMENT_MAX_ATTEMPTS,
+        sweep_lock_path: str = SENTIMENT_SWEEP_LOCK_PATH,
+    ):
+        self.db = db
+        self.scorer = scorer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.sweep_lock_path = sweep_lock_path
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._queued = set()  # ids queued or being scored
+        self._task = None
+        self._sweep_task = None
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.scored = 0
+        self.batches = 0
+        self.failures = 0
+        self.abandoned = 0
+        self.swept = 0
+        self.sweep_skipped = False
+        self.busy_seconds = 0.0
+        self.last_lag_seconds = 0.0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        self._sweep_task = asyncio.create_task(self._sweep())
+
+    def stop(self):
+        for task in (self._task, self._sweep_task):
+            if task:
+                task.cancel()
+
+    def enqueue(self, entries):
+        for entry in entries:
+            try:
+                self._queue.put_nowait((time.monotonic(), entry.id, entry.content))
+                self._queued.add(entry.id)
+                self.enqueued += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            scored = await self._score(batch)
+            self._queued.difference_update(entry_id for _, entry_id, _ in batch)
+            if scored:
+                self.batches += 1
+                self.scored += len(batch)
+                self.last_lag_seconds = round(time.monotonic() - batch[0][0], 3)
+
+    async def _score(self, batch: list) -> bool:
+        delay = self.flush_interval
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.monotonic()
+            try:
+                scores = await self.scorer.score_batch([content for _, _, content in batch])
+                await self.db.update_sentiment_scores(
+                    [{"id": entry_id, "score": score} for (_, entry_id, _), score in zip(batch, scores)]
+                )
+                return True
+            except Exception as e:
+                self.failures += 1
+                logger.error("❌ Failed to score %d journal entries (attempt %d): %s", len(batch), attempt, e)
+            finally:
+                self.busy_seconds += time.monotonic() - started
+            if attempt < self.max_attempts:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+        # Left NULL in the DB; the next start-up sweep picks them up again
+        self.abandoned += len(batch)
+        return False
+
+    async def _sweep(self):
+        """Re-enqueue journal entries that still have no sentiment score, in one worker only."""
+        with open(self.sweep_lock_path, "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.sweep_skipped = True
+                logger.info("Another worker is sweeping unscored journal entries")
+                return
+            try:
+                swept = await self._enqueue_unscored()
+                # Keep the lock until they are scored: a worker starting now
+                # would find them still NULL and score them again
+                while swept & self._queued:
+                    await asyncio.sleep(self.flush_interval)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    async def _enqueue_unscored(self) -> set:
+        swept = set()
+        delay = self.flush_interval
+        while True:
+            try:
+                async for rows in self.db.iter_unscored_journal_entries():
+                    for row in rows:
+                        if row["id"] in self._queued:
+                            continue
+                        # Wait for room rather than drop: there is no request to keep fast here
+                        await self._queue.put((time.monotonic(), row["id"], row["content"]))
+                        self._queued.add(row["id"])
+                        swept.add(row["id"])
+                        self.swept += 1
+                return swept
+            except Exception as e:
+                logger.error("❌ Failed to sweep unscored journal entries: %s", e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def stats(self) -> dict:
+        oldest = self._queue._queue[0][0] if self._queue.qsize() else None
+        return {
+            "scorer": type(self.scorer).__name__,
+            "pending": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "scored": self.scored,
+            "batches": self.batches,
+            "failures": self.failures,
+            "abandoned": self.abandoned,
+            "swept": self.swept,
+            "sweep_skipped": self.sweep_skipped,
+            "entries_per_second": round(self.scored / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+            "queue_lag_seconds": round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+            "last_batch_lag_seconds": self.last_lag_seconds,
+        }
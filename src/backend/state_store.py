@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory")  # "memory" or "sqlite"
+STATE_SQLITE_PATH = os.environ.get("STATE_SQLITE_PATH", "agent_state.db")
+# How long a write on the request path may wait for another worker's lock
+# before it is handed to the background writer instead
+STATE_SQLITE_BUSY_TIMEOUT_SECONDS = float(os.environ.get("STATE_SQLITE_BUSY_TIMEOUT_SECONDS", "0.05"))
+STATE_SQLITE_WRITER_TIMEOUT_SECONDS = float(os.environ.get("STATE_SQLITE_WRITER_TIMEOUT_SECONDS", "5"))
+STATE_LOG_CAPACITY = int(os.environ.get("STATE_LOG_CAPACITY", "50"))
+STATE_MAP_CAPACITY = int(os.environ.get("STATE_MAP_CAPACITY", "50"))
+
+
+class RingBuffer:
+    """Fixed-capacity log keeping the newest `capacity` values and an all-time count."""
+
+    __slots__ = ("capacity", "total", "_items")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0
+        self._items = [None] * capacity
+
+    def append(self, value) -> int:
+        self._items[self.total % self.capacity] = value
+        self.total += 1
+        return self.total
+
+    def recent(self, n: Optional[int] = None) -> list:
+        """Up to `n` newest values, oldest first."""
+        size = min(self.total, self.capacity)
+        n = size if n is None else min(n, size)
+        end = self.total % self.capacity
+        start = (end - n) % self.capacity
+        if n and start >= end:
+            return self._items[start:] + self._items[:end]
+        return self._items[start:end]
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+
+class MemoryStateStore:
+    """Per-user agent state in this process only."""
+
+    def __init__(self, log_capacity: int = STATE_LOG_CAPACITY, map_capacity: int = STATE_MAP_CAPACITY):
+        self.log_capacity = log_capacity
+        self.map_capacity = map_capacity
+        self._logs: Dict[Tuple[str, str], RingBuffer] = {}
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._maps: Dict[Tuple[str, str], dict] = {}
+
+    def append(self, user_id: str, log: str, value: str) -> int:
+        buffer = self._logs.get((user_id, log))
+        if buffer is None:
+            buffer = self._logs[(user_id, log)] = RingBuffer(self.log_capacity)
+        return buffer.append(value)
+
+    def recent(self, user_id: str, log: str, n: Optional[int] = None) -> List[str]:
+        buffer = self._logs.get((user_id, log))
+        return buffer.recent(n) if buffer else []
+
+    def count(self, user_id: str, log: str) -> int:
+        buffer = self._logs.get((user_id, log))
+        return buffer.total if buffer else 0
+
+    def incr(self, user_id: str, counter: str) -> int:
+        """Increment and return the new value."""
+        value = self._counters.get((user_id, counter), 0) + 1
+        self._counters[(user_id, counter)] = value
+        return value
+
+    def put(self, user_id: str, name: str, key: str, value):
+        items = self._maps.setdefault((user_id, name), {})
+        items[key] = value
+        if len(items) > self.map_capacity:
+            del items[next(iter(items))]  # oldest insertion
+
+    def get(self, user_id: str, name: str, key: str, default=None):
+        return self._maps.get((user_id, name), {}).get(key, default)
+
+    def items(self, user_id: str, name: str) -> dict:
+        return dict(self._maps.get((user_id, name), {}))
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "logs": len(self._logs),
+            "counters": len(self._counters),
+            "maps": len(self._maps),
+        }
+
+
+class SQLiteStateStore:
+    """Per-user agent state in a local SQLite file shared by all worker processes.
+
+    Logs are ring buffers of `log_capacity` slots: the n-th value overwrites
+    slot n % capacity, so a user's log never grows. The all-time count lives in
+    `state_counters`, so counts are a single-row read. WAL mode lets workers
+    read while another one writes.
+
+    Writes are called from async handlers, so they wait at most
+    `busy_timeout` for another worker's write lock. Past that the write is
+    queued for a background writer thread (which waits as long as it takes)
+    and the caller gets an estimate: the current count plus one. While
+    deferred writes are pending, later writes queue behind them to keep
+    their order.
+    """
+
+    def __init__(self, path: str = STATE_SQLITE_PATH, log_capacity: int = STATE_LOG_CAPACITY, map_capacity: int = STATE_MAP_CAPACITY):
+        self.path = path
+        self.log_capacity = log_capacity
+        self.map_capacity = map_capacity
+        self.busy_timeout = STATE_SQLITE_BUSY_TIMEOUT_SECONDS
+        self._local = threading.local()
+        self._writes: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self.deferred_writes = 0
+        # Once per process, so it may wait out other workers' writes
+        conn = sqlite3.connect(path, timeout=STATE_SQLITE_WRITER_TIMEOUT_SECONDS)
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS state_logs (
+                    user_id TEXT, log TEXT, slot INTEGER, seq INTEGER, value TEXT,
+                    PRIMARY KEY (user_id, log, slot)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS state_counters (
+                    user_id TEXT, name TEXT, value INTEGER,
+                    PRIMARY KEY (user_id, name)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS state_maps (
+                    user_id TEXT, name TEXT, key TEXT, value TEXT, seq INTEGER,
+                    PRIMARY KEY (user_id, name, key)
+                ) WITHOUT ROWID;
+            """)
+        finally:
+            conn.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            timeout = getattr(self._local, "timeout", self.busy_timeout)
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _incr(self, conn, user_id: str, name: str) -> int:
+        return conn.execute(
+            "INSERT INTO state_counters VALUES (?, ?, 1) "
+            "ON CONFLICT (user_id, name) DO UPDATE SET value = value + 1 RETURNING value",
+            (user_id, name),
+        ).fetchone()[0]
+
+    def _write(self, transaction, args: tuple, estimate=None):
+        """Run `transaction(conn, *args)` now, or defer it if the write lock is contended."""
+        if not self._writes.unfinished_tasks:
+            try:
+                return transaction(self._conn(), *args)
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+        self.deferred_writes += 1
+        self._writes.put((transaction, args))
+        self._start_writer()
+        return estimate() if estimate else None
+
+    def _start_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._drain, name="state-store-writer", daemon=True)
+                self._writer.start()
+
+    def _drain(self):
+        self._local.timeout = STATE_SQLITE_WRITER_TIMEOUT_SECONDS
+        while True:
+            transaction, args = self._writes.get()
+            try:
+                while True:
+                    try:
+                        transaction(self._conn(), *args)
+                        break
+                    except sqlite3.OperationalError as e:
+                        if "locked" not in str(e) and "busy" not in str(e):
+                            raise
+            except Exception as e:
+                logger.error("❌ Deferred agent state write failed: %s", e)
+            finally:
+                self._writes.task_done()
+
+    def _counter(self, user_id: str, name: str) -> int:
+        row = self._conn().execute(
+            "SELECT value FROM state_counters WHERE user_id = ? AND name = ?", (user_id, name)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def append(self, user_id: str, log: str, value: str) -> int:
+        return self._write(self._append, (user_id, log, value), lambda: self.count(user_id, log) + 1)
+
+    def _append(self, conn, user_id: str, log: str, value: str) -> int:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            total = self._incr(conn, user_id, f"log:{log}")
+            conn.execute(
+                "INSERT OR REPLACE INTO state_logs VALUES (?, ?, ?, ?, ?)",
+                (user_id, log, (total - 1) % self.log_capacity, total, value),
+            )
+        return total
+
+    def recent(self, user_id: str, log: str, n: Optional[int] = None) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT value FROM state_logs WHERE user_id = ? AND log = ? ORDER BY seq DESC LIMIT ?",
+            (user_id, log, self.log_capacity if n is None else n),
+        ).fetchall()
+        return [value for value, in reversed(rows)]
+
+    def count(self, user_id: str, log: str) -> int:
+        return self._counter(user_id, f"log:{log}")
+
+    def incr(self, user_id: str, counter: str) -> int:
+        return self._write(self._incr_counter, (user_id, counter), lambda: self._counter(user_id, counter) + 1)
+
+    def _incr_counter(self, conn, user_id: str, counter: str) -> int:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return self._incr(conn, user_id, counter)
+
+    def put(self, user_id: str, name: str, key: str, value):
+        self._write(self._put, (user_id, name, key, value))
+
+    def _put(self, conn, user_id: str, name: str, key: str, value):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                "UPDATE state_maps SET value = ? WHERE user_id = ? AND name = ? AND key = ?",
+                (json.dumps(value), user_id, name, key),
+            ).rowcount
+            if updated:
+                return
+            seq = self._incr(conn, user_id, f"map:{name}")
+            conn.execute("INSERT INTO state_maps VALUES (?, ?, ?, ?, ?)", (user_id, name, key, json.dumps(value), seq))
+            # Drop the oldest insertions beyond capacity
+            conn.execute(
+                "DELETE FROM state_maps WHERE user_id = ? AND name = ? AND seq <= ?",
+                (user_id, name, seq - self.map_capacity),
+            )
+
+    def get(self, user_id: str, name: str, key: str, default=None):
+        row = self._conn().execute(
+            "SELECT value FROM state_maps WHERE user_id = ? AND name = ? AND key = ?", (user_id, name, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def items(self, user_id: str, name: str) -> dict:
+        rows = self._conn().execute(
+            "SELECT key, value FROM state_maps WHERE user_id = ? AND name = ? ORDER BY seq", (user_id, name)
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "log_rows": conn.execute("SELECT COUNT(*) FROM state_logs").fetchone()[0],
+            "counters": conn.execute("SELECT COUNT(*) FROM state_counters").fetchone()[0],
+            "map_rows": conn.execute("SELECT COUNT(*) FROM state_maps").fetchone()[0],
+            "deferred_writes": self.deferred_writes,
+            "pending_writes": self._writes.unfinished_tasks,
+        }
+
+
+def create_state_store(backend: str = STATE_BACKEND):
+    if backend == "sqlite":
+        return SQLiteStateStore()
+    return MemoryStateStore()
@@ -0,0 +1,138 @@
+import json
+
+
+class IncrementalJSONParser:
+    """Parses a top-level JSON object out of a text stream as it arrives.
+
+    Text before the opening `{` (e.g. a markdown fence) is ignored. `feed`
+    returns events as soon as they are complete:
+
+      ("item", key, value)   - an element of a top-level array field
+      ("field", key, value)  - a top-level field
+
+    Completed fields are also collected in `result`.
+    """
+
+    def __init__(self):
+        self.result = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escape = False
+
+        self._expect = "key"  # what comes next inside the top-level object
+        self._key = None
+        self._value_start = None
+        self._value_kind = None
+        self._item_start = None
+        self._item_kind = None
+
+    def feed(self, chunk: str) -> list:
+        self._text += chunk
+        events = []
+        text = self._text
+
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            c = text[i]
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._string_closed(i, events)
+                continue
+
+            if c == '"':
+                self._token_started(i, c)
+                self._in_string = True
+            elif c in "{[":
+                self._token_started(i, c)
+                self._depth += 1
+            elif c in "}]":
+                self._end_literal(i, events)
+                self._depth -= 1
+                self._container_closed(i, events)
+            elif c == ",":
+                self._end_literal(i, events)
+                if self._depth == 1:
+                    self._expect = "key"
+            elif c == ":" and self._depth == 1:
+                self._expect = "value"
+            elif not c.isspace():
+                self._token_started(i, c)
+
+        self._pos = len(text)
+        return events
+
+    def _token_started(self, i: int, c: str):
+        if self._depth == 1:
+            if self._expect == "key" and c == '"':
+                self._value_start = i
+            elif self._expect == "value" and self._value_start is None:
+                self._value_start = i
+                self._value_kind = c
+        elif self._depth == 2 and self._value_kind == "[" and self._item_start is None:
+            self._item_start = i
+            self._item_kind = c
+
+    def _string_closed(self, i: int, events: list):
+        if self._depth == 1 and self._expect == "key":
+            self._key = self._load(self._value_start, i + 1)
+            self._value_start = None
+            self._expect = "colon"
+        elif self._depth == 1 and self._expect == "value" and self._value_kind == '"':
+            self._emit_field(i + 1, events)
+        elif self._depth == 2 and self._value_kind == "[" and self._item_kind == '"':
+            self._emit_item(i + 1, events)
+
+    def _end_literal(self, i: int, events: list):
+        # Numbers, booleans and null only end at the next delimiter
+        if self._depth == 1 and self._expect == "value" and self._value_start is not None and self._value_kind not in '"{[':
+            self._emit_field(i, events)
+        elif self._depth == 2 and self._value_kind == "[" and self._item_start is not None and self._item_kind not in '"{[':
+            self._emit_item(i, events)
+
+    def _container_closed(self, i: int, events: list):
+        if self._depth == 0:
+            self.done = True
+        elif self._depth == 1 and self._value_start is not None and self._expect == "value":
+            self._emit_field(i + 1, events)
+        elif self._depth == 2 and self._value_kind == "[" and self._item_start is not None:
+            self._emit_item(i + 1, events)
+
+    def _emit_field(self, end: int, events: list):
+        value = self._load(self._value_start, end)
+        self._value_start = None
+        self._value_kind = None
+        self._item_start = None
+        self._expect = "comma"
+        if self._key is not None and value is not None:
+            self.result[self._key] = value
+            events.append(("field", self._key, value))
+
+    def _emit_item(self, end: int, events: list):
+        value = self._load(self._item_start, end)
+        self._item_start = None
+        self._item_kind = None
+        if value is not None:
+            events.append(("item", self._key, value))
+
+    def _load(self, start: int, end: int):
+        try:
+            return json.loads(self._text[start:end])
+        except ValueError:
+            return None
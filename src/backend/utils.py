@@ -1,11 +1,15 @@
 # src/backend/utils.py
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 load_dotenv()
 
+GEMINI_MODEL_NAME = os.environ.get("GEMINI_MODEL_NAME", "models/gemini-1.5-flash")
+
 def get_gemini_model():
+  # Imported here: the SDK (and grpc) take a large share of cold start
+  import google.generativeai as genai
+
   api_key = os.getenv("GOOGLE_API_KEY")
   genai.configure(api_key=api_key)
-  return genai.GenerativeModel("models/gemini-1.5-flash")
+  return genai.GenerativeModel(GEMINI_MODEL_NAME)
@@ -0,0 +1,383 @@
+import asyncio
+import fcntl
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from metrics import AGENT_CALL_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", "vector_index")
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "hashing")  # "hashing" or "gemini"
+EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DIM", "256"))
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "6"))
+RETRIEVAL_TOKEN_BUDGET = int(os.environ.get("RETRIEVAL_TOKEN_BUDGET", "600"))
+RETRIEVAL_RECENCY_HALF_LIFE_DAYS = float(os.environ.get("RETRIEVAL_RECENCY_HALF_LIFE_DAYS", "14"))
+RETRIEVAL_RECENCY_WEIGHT = float(os.environ.get("RETRIEVAL_RECENCY_WEIGHT", "0.3"))
+PASSAGE_WORDS = 120
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text
+    return max(1, len(text) // 4)
+
+
+def split_passages(text: str, words: int = PASSAGE_WORDS) -> List[str]:
+    tokens = text.split()
+    return [" ".join(tokens[i:i + words]) for i in range(0, len(tokens), words)] or [""]
+
+
+class HashingEmbedder:
+    """Local embedding via the hashing trick over unigrams and bigrams."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self.embed_sync, texts)
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode())
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class GeminiEmbedder:
+    """Gemini text embeddings (models/embedding-001)."""
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        import google.generativeai as genai
+
+        result = await asyncio.to_thread(
+            genai.embed_content, model="models/embedding-001", content=texts, task_type="retrieval_document"
+        )
+        vectors = np.array(result["embedding"], dtype=np.float32).reshape(len(texts), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class UserVectorIndex:
+    """One user's passage vectors in a memory-mapped float32 matrix.
+
+    Files: `vectors.f32` (capacity x dim, grown by doubling), `passages.jsonl`
+    (one line per row: entry id, created_at, title, text) and `meta.json`.
+    Workers share the files: `add` holds an exclusive lock on `.lock`, and
+    `meta.json` (replaced atomically, last) is the commit point; rows and
+    passage bytes past its `count` and `passages_bytes` are an unfinished
+    write and are ignored, then overwritten.
+
+    Methods block on the file lock and disk, so callers run them in a worker
+    thread; `_mutex` keeps `query` from reading while `add` or `refresh` swap
+    the arrays.
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self._mutex = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _meta_stamp(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self._file("meta.json"))
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._file("meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return meta if meta.get("dim") == self.dim else {}
+
+    def _write_meta(self):
+        with open(self._file("meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": self.count, "capacity": self.capacity, "passages_bytes": self.passages_bytes}, f)
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+        self._stamp = self._meta_stamp()
+
+    def _load(self):
+        self._stamp = self._meta_stamp()
+        meta = self._read_meta()
+        self.count = meta.get("count", 0)
+        self.capacity = meta.get("capacity", 0)
+        self.passages_bytes = meta.get("passages_bytes")
+        self.entry_ids = set()
+        self.passages: List[dict] = []
+        self.timestamps = np.zeros(0, dtype=np.float64)
+        self._vectors: Optional[np.memmap] = None
+
+        if self.capacity:
+            self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+            # Indexes written before passages_bytes was recorded: trust the first `count` lines
+            with open(self._file("passages.jsonl"), "rb") as f:
+                lines = f.read(-1 if self.passages_bytes is None else self.passages_bytes).splitlines(keepends=True)[: self.count]
+            self.passages = [json.loads(line) for line in lines]
+            self.count = len(self.passages)
+            self.passages_bytes = sum(len(line) for line in lines)
+            self.entry_ids = {p["entry_id"] for p in self.passages}
+            self.timestamps = np.array([_epoch(p["created_at"]) for p in self.passages], dtype=np.float64)
+        else:
+            self.passages_bytes = 0
+
+    def refresh(self):
+        """Reload if another worker has committed rows since we last read the index."""
+        with self._mutex:
+            if self._meta_stamp() != self._stamp:
+                self._load()
+
+    @contextmanager
+    def _locked(self):
+        with open(self._file(".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _grow(self, needed: int):
+        capacity = max(64, self.capacity)
+        while capacity < needed:
+            capacity *= 2
+        grown = np.memmap(self._file("vectors.f32.tmp"), dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+        if self._vectors is not None:
+            grown[: self.count] = self._vectors[: self.count]
+            del self._vectors
+        grown.flush()
+        del grown
+        os.replace(self._file("vectors.f32.tmp"), self._file("vectors.f32"))
+        self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def add(self, passages: List[dict], vectors: np.ndarray):
+        if not passages:
+            return
+        with self._mutex, self._locked():
+            self.refresh()
+            keep = [i for i, p in enumerate(passages) if p["entry_id"] not in self.entry_ids]
+            if not keep:
+                return
+            if len(keep) < len(passages):
+                passages, vectors = [passages[i] for i in keep], vectors[keep]
+            if self.count + len(passages) > self.capacity:
+                self._grow(self.count + len(passages))
+
+            self._vectors[self.count: self.count + len(passages)] = vectors
+            self._vectors.flush()
+            data = "".join(json.dumps(p) + "\n" for p in passages).encode("utf-8")
+            with open(self._file("passages.jsonl"), "ab") as f:
+                f.truncate(self.passages_bytes)  # drop lines from a write that never committed
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.passages.extend(passages)
+            self.entry_ids.update(p["entry_id"] for p in passages)
+            self.timestamps = np.concatenate([self.timestamps, [_epoch(p["created_at"]) for p in passages]])
+            self.count += len(passages)
+            self.passages_bytes += len(data)
+            self._write_meta()
+
+    def query(self, vector: np.ndarray, k: int, token_budget: int, now: float) -> List[dict]:
+        """Top passages by similarity blended with recency, packed under `token_budget`."""
+        with self._mutex:
+            if not self.count:
+                return []
+            similarity = self._vectors[: self.count] @ vector
+            passages, timestamps = self.passages, self.timestamps
+        age_days = np.maximum(now - timestamps, 0) / 86400
+        recency = np.exp(-age_days * math.log(2) / RETRIEVAL_RECENCY_HALF_LIFE_DAYS)
+        scores = (1 - RETRIEVAL_RECENCY_WEIGHT) * similarity + RETRIEVAL_RECENCY_WEIGHT * recency
+
+        candidates = min(len(similarity), k * 4)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.argsort(-scores[top])]
+
+        chosen, used = [], 0
+        for row in top:
+            passage = passages[row]
+            tokens = estimate_tokens(passage["text"])
+            if used + tokens > token_budget:
+                continue
+            chosen.append(passage)
+            used += tokens
+            if len(chosen) == k:
+                break
+        # Present chronologically so the model sees the narrative in order
+        return sorted(chosen, key=lambda p: p["created_at"])
+
+
+def _epoch(created_at: str) -> float:
+    return datetime.fromisoformat(created_at.replace('Z', '+00:00')).astimezone(timezone.utc).timestamp()
+
+
+class JournalRetriever:
+    """Embeds journal entries at write time and retrieves passages for prompts.
+
+    A user's index is backfilled from their journal in the background the
+    first time it is needed; until it exists `retrieve` returns nothing and
+    the caller falls back to the recent entries.
+    """
+
+    def __init__(self, db, embedder=None, index_dir: str = VECTOR_INDEX_DIR):
+        self.db = db
+        self.embedder = embedder or (GeminiEmbedder() if EMBEDDING_BACKEND == "gemini" else HashingEmbedder())
+        self.index_dir = index_dir
+        self._indexes: Dict[str, UserVectorIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._building: Dict[str, asyncio.Task] = {}
+        self._tasks = set()
+
+        self.queries = 0
+        self.total_ms = 0.0
+        self.retrieved_tokens = 0
+
+    def _lock(self, user_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(user_id, asyncio.Lock())
+
+    async def _index(self, user_id: str, wait: bool = True) -> Optional[UserVectorIndex]:
+        """The user's index, opened on first use. Missing indexes are backfilled in
+        the background; unless `wait`, None is returned until the backfill is done."""
+        index = self._indexes.get(user_id)
+        if index is None:
+            path = os.path.join(self.index_dir, user_id)
+            if not await asyncio.to_thread(os.path.exists, os.path.join(path, "meta.json")):
+                task = self._building.get(user_id)
+                if task is None:
+                    task = self._building[user_id] = asyncio.ensure_future(self._build(user_id, path))
+                    self._tasks.add(task)
+                    task.add_done_callback(lambda t: self._built(user_id, t))
+                if not wait:
+                    return None
+                await asyncio.shield(task)
+            index = self._indexes[user_id] = await asyncio.to_thread(UserVectorIndex, path, self.embedder.dim)
+        return index
+
+    def _built(self, user_id: str, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._building.pop(user_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("❌ Failed to backfill the journal vector index for %s: %s", user_id, task.exception())
+
+    async def build(self, user_id: str):
+        """Backfill the user's index if it is missing, and wait for it."""
+        async with self._lock(user_id):
+            await self._index(user_id)
+
+    async def _build(self, user_id: str, path: str):
+        """Backfill a user's index in a scratch directory and move it into place once complete.
+
+        A failed backfill leaves nothing behind, so the next load retries it
+        instead of serving a partial index. If another worker finished first,
+        its index wins and ours is discarded.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        scratch = tempfile.mkdtemp(prefix=f".{user_id}.", dir=self.index_dir)
+        try:
+            index = UserVectorIndex(scratch, self.embedder.dim)
+            async for rows in self.db.iter_user_journal_entries(user_id):
+                await self._add(index, rows)
+            if not index.count:
+                await asyncio.to_thread(index._write_meta)  # an empty index still counts as built
+            await asyncio.to_thread(self._move_into_place, scratch, path)
+        finally:
+            await asyncio.to_thread(shutil.rmtree, scratch, ignore_errors=True)
+
+    @staticmethod
+    def _move_into_place(scratch: str, path: str):
+        try:
+            os.rename(scratch, path)
+        except OSError:
+            if os.path.exists(os.path.join(path, "meta.json")):
+                return
+            # Leftovers of an interrupted write from before builds were staged
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(scratch, path)
+
+    async def _add(self, index: UserVectorIndex, rows: List[dict]):
+        passages = [
+            {"entry_id": row["id"], "created_at": row["created_at"], "title": row.get("title"), "text": text}
+            for row in rows
+            if row["id"] not in index.entry_ids
+            for text in split_passages(row["content"])
+        ]
+        if passages:
+            vectors = await self.embedder.embed([p["text"] for p in passages])
+            await asyncio.to_thread(index.add, passages, vectors)
+
+    async def add_entries(self, entries):
+        for entry in entries:
+            async with self._lock(entry.user_id):
+                index = await self._index(entry.user_id)
+                await self._add(index, [{
+                    "id": entry.id,
+                    "created_at": entry.created_at.isoformat(),
+                    "title": entry.title,
+                    "content": entry.content,
+                }])
+
+    def on_journal_entries(self, entries):
+        # Embedding happens off the request path
+        task = asyncio.ensure_future(self.add_entries(entries))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @timed(AGENT_CALL_SECONDS)
+    async def retrieve(self, user_id: str, query: str, k: int = RETRIEVAL_TOP_K, token_budget: int = RETRIEVAL_TOKEN_BUDGET) -> List[dict]:
+        started = time.perf_counter()
+        async with self._lock(user_id):
+            index = await self._index(user_id, wait=False)
+        if index is None:
+            return []
+        vector = (await self.embedder.embed([query]))[0]
+        passages = await asyncio.to_thread(self._query, index, vector, k, token_budget)
+
+        self.queries += 1
+        self.total_ms += (time.perf_counter() - started) * 1000
+        self.retrieved_tokens += sum(estimate_tokens(p["text"]) for p in passages)
+        return passages
+
+    @staticmethod
+    def _query(index: UserVectorIndex, vector: np.ndarray, k: int, token_budget: int) -> List[dict]:
+        index.refresh()
+        return index.query(vector, k, token_budget, time.time())
+
+    def stats(self) -> dict:
+        return {
+            "embedder": type(self.embedder).__name__,
+            "users_loaded": len(self._indexes),
+            "users_building": len(self._building),
+            "queries": self.queries,
+            "avg_retrieval_ms": round(self.total_ms / self.queries, 1) if self.queries else 0.0,
+            "avg_retrieved_tokens": round(self.retrieved_tokens / self.queries, 1) if self.queries else 0.0,
+        }
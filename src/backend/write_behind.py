@@ -0,0 +1,303 @@
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+import httpx
+
+from models.schemas import MoodInput, MoodResponse
+
+logger = logging.getLogger(__name__)
+
+MOOD_WRITE_BEHIND = os.environ.get("MOOD_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", "200"))
+WRITE_BEHIND_FLUSH_SECONDS = float(os.environ.get("WRITE_BEHIND_FLUSH_SECONDS", "0.5"))
+WRITE_BEHIND_SUBMIT_TIMEOUT_SECONDS = float(os.environ.get("WRITE_BEHIND_SUBMIT_TIMEOUT_SECONDS", "1"))
+WRITE_BEHIND_SPILL_PATH = os.environ.get("WRITE_BEHIND_SPILL_PATH", "mood_write_behind.jsonl")
+WRITE_BEHIND_FSYNC = os.environ.get("WRITE_BEHIND_FSYNC", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get("WRITE_BEHIND_MAX_ATTEMPTS", "8"))
+
+
+class BufferFullError(Exception):
+    pass
+
+
+def is_permanent(error: Exception) -> bool:
+    """A 4xx from PostgREST (constraint or foreign-key violation, malformed row) fails the same way on retry."""
+    return (
+        isinstance(error, httpx.HTTPStatusError)
+        and 400 <= error.response.status_code < 500
+        and error.response.status_code not in (408, 429)
+    )
+
+
+class MoodWriteBuffer:
+    """Write-behind buffer for mood check-ins with group commit.
+
+    `submit` assigns the id and created_at locally, appends the row to a spill
+    file and enqueues it; a background flusher inserts queued rows in batches
+    of up to `batch_size` (or whatever arrived within `flush_interval`).
+
+    Each process spills to its own `<spill_path>.<pid>` file and holds an
+    flock on it while running. On start a worker claims every spill file no
+    live process holds (left by a crash or a stopped worker) and replays its
+    rows - inserts are keyed on the row id, so replaying an already-committed
+    row is a no-op.
+
+    A batch the database rejects outright (4xx) is bisected down to the
+    offending rows, which are dropped and counted. Transient failures are
+    retried with backoff up to `max_attempts`; the batch is then parked in
+    `<spill_path>.<pid>.failed`, which the next worker to start claims like
+    any other orphaned spill file, so the flusher moves on.
+    """
+
+    def __init__(
+        self,
+        db,
+        on_commit: Optional[Callable[[List[MoodResponse]], None]] = None,
+        max_pending: int = WRITE_BEHIND_MAX_PENDING,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_interval: float = WRITE_BEHIND_FLUSH_SECONDS,
+        submit_timeout: float = WRITE_BEHIND_SUBMIT_TIMEOUT_SECONDS,
+        spill_path: str = WRITE_BEHIND_SPILL_PATH,
+        max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS,
+    ):
+        self.db = db
+        self.on_commit = on_commit
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self.spill_path = spill_path
+        self._own_path = f"{spill_path}.{os.getpid()}"
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._spill = None
+        self._spilled_lines = 0
+        self._in_flight: list = []
+        self._backlog: list = []
+        self._task: Optional[asyncio.Task] = None
+
+        self.submitted = 0
+        self.rejected = 0
+        self.committed = 0
+        self.batches = 0
+        self.flush_failures = 0
+        self.dropped = 0
+        self.parked = 0
+        self.last_flush_ms = 0.0
+
+    async def start(self):
+        self._spill = open(self._own_path, "a", encoding="utf-8")
+        fcntl.flock(self._spill, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # Replayed rows bypass the bounded queue; the flusher drains them first
+        self._backlog = self._claim_spills()
+        if self._backlog:
+            logger.info("♻️ Replaying %d buffered mood check-ins", len(self._backlog))
+        self._task = asyncio.create_task(self._run())
+        self._task.add_done_callback(self._flusher_done)
+
+    async def stop(self, timeout: float = 10):
+        # Give the flusher a chance to drain; anything left stays in the spill file
+        deadline = time.monotonic() + timeout
+        while (self._queue.qsize() or self._in_flight or self._backlog) and time.monotonic() < deadline:
+            await asyncio.sleep(self.flush_interval)
+        if self._task:
+            self._task.cancel()
+        if self._spill:
+            if not (self._queue.qsize() or self._in_flight or self._backlog):
+                os.unlink(self._own_path)  # Everything committed; nothing for a successor to claim
+            self._spill.close()
+
+    async def submit(self, user_id: str, mood: MoodInput) -> MoodResponse:
+        row = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "mood_value": mood.mood_value,
+            "mood_score": mood.mood_score,
+            "notes": mood.notes,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        # Backpressure: wait briefly for room, then shed load
+        try:
+            await asyncio.wait_for(self._queue.put(row), timeout=self.submit_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BufferFullError("Mood buffer is full, try again shortly")
+
+        self._spill.write(json.dumps(row) + "\n")
+        self._spill.flush()
+        if WRITE_BEHIND_FSYNC:
+            os.fsync(self._spill.fileno())
+        self._spilled_lines += 1
+        self.submitted += 1
+        return MoodResponse(**row)
+
+    async def _run(self):
+        while self._backlog:
+            batch = self._backlog[: self.batch_size]
+            self._in_flight = batch
+            await self._commit(batch)
+            del self._backlog[: self.batch_size]
+            self._in_flight = []
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            self._in_flight = batch
+            await self._commit(batch)
+            self._in_flight = []
+            try:
+                self._compact()
+            except OSError as e:
+                # The rows are committed; an oversized spill file only costs a longer replay
+                logger.error("❌ Failed to compact the mood spill file: %s", e)
+
+    def _flusher_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("❌ Mood flusher stopped: %r", task.exception())
+
+    async def _commit(self, batch: list):
+        started = time.perf_counter()
+        created = await self._write(batch)
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.batches += 1
+        if self.on_commit and created:
+            try:
+                self.on_commit(created)
+            except Exception as e:
+                logger.error("❌ Mood commit hook failed: %s", e)
+
+    async def _write(self, batch: list) -> List[MoodResponse]:
+        delay = self.flush_interval
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                created = await self.db.write_mood_rows(batch)
+                self.committed += len(batch)
+                return created
+            except Exception as e:
+                self.flush_failures += 1
+                if is_permanent(e):
+                    if len(batch) == 1:
+                        self.dropped += 1
+                        logger.error("❌ Dropping mood check-in %s rejected by the database: %s", json.dumps(batch[0]), e)
+                        return []
+                    # Split until the rejected rows are isolated; the rest still commit
+                    middle = len(batch) // 2
+                    return await self._write(batch[:middle]) + await self._write(batch[middle:])
+                logger.error("❌ Failed to flush %d mood check-ins (attempt %d): %s", len(batch), attempt, e)
+            if attempt < self.max_attempts:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+        self._park(batch)
+        return []
+
+    def _park(self, batch: list):
+        path = f"{self._own_path}.failed"
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(row) + "\n" for row in batch)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            # Still in our spill file only if compaction hasn't run; say what is lost
+            logger.error("❌ Failed to park %d mood check-ins in %s: %s", len(batch), path, e)
+            return
+        self.parked += len(batch)
+        logger.error("❌ Parked %d mood check-ins in %s for the next worker start", len(batch), path)
+
+    def _compact(self):
+        # Once everything spilled has been committed the file can start over;
+        # under sustained load, rewrite it with just the rows still queued.
+        if self._queue.empty():
+            self._spill.truncate(0)
+            self._spill.seek(0)
+            self._spilled_lines = 0
+        elif self._spilled_lines > 2 * self.max_pending:
+            pending = list(self._queue._queue)
+            tmp_path = f"{self._own_path}.tmp"
+            spill = open(tmp_path, "w", encoding="utf-8")
+            # Lock before it becomes visible so no starting worker can claim it
+            fcntl.flock(spill, fcntl.LOCK_EX)
+            spill.writelines(json.dumps(row) + "\n" for row in pending)
+            spill.flush()
+            os.replace(tmp_path, self._own_path)
+            self._spill.close()
+            self._spill = spill
+            self._spilled_lines = len(pending)
+
+    def _claim_spills(self) -> list:
+        """Take over spill files no running worker holds, moving their rows into ours."""
+        rows = self._read_spill(self._own_path)  # a previous process with our pid
+        for path in sorted(glob.glob(f"{glob.escape(self.spill_path)}*")):
+            if path == self._own_path:
+                continue
+            try:
+                f = open(path, encoding="utf-8")
+            except OSError:
+                continue
+            with f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # its worker is alive
+                try:
+                    if os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+                        continue  # claimed and removed by another worker meanwhile
+                except FileNotFoundError:
+                    continue
+                claimed = self._read_spill(path)
+                self._spill.writelines(json.dumps(row) + "\n" for row in claimed)
+                self._spill.flush()
+                os.fsync(self._spill.fileno())
+                os.unlink(path)
+            rows.extend(claimed)
+        self._spilled_lines = len(rows)
+        return rows
+
+    @staticmethod
+    def _read_spill(path: str) -> list:
+        if not os.path.exists(path):
+            return []
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+        return rows
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize() + len(self._backlog),
+            "in_flight": len(self._in_flight),
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "committed": self.committed,
+            "batches": self.batches,
+            "avg_batch_size": round(self.committed / self.batches, 1) if self.batches else 0.0,
+            "flush_failures": self.flush_failures,
+            "dropped": self.dropped,
+            "parked": self.parked,
+            "last_flush_ms": self.last_flush_ms,
+        }